@@ -0,0 +1,366 @@
+"""
+Stand-in for a ComfyUI server: prompts queue up and "render" one at a time
+for a configurable time, then their SaveImage / VHS_VideoCombine outputs
+appear in history and can be downloaded from /api/view. Execution messages
+go out over /ws?clientId= to the client that queued the prompt, in the same
+order ComfyUI sends them.
+
+    python -m benchmarks.fake_comfy_server --port 8188 --latency 5 --failure-rate 0.05
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import socket
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+def _ws_frame(text: str) -> bytes:
+    """Unmasked, unfragmented server-to-client text frame"""
+    payload = text.encode("utf-8")
+    if len(payload) < 126:
+        header = struct.pack("!BB", 0x81, len(payload))
+    elif len(payload) < 1 << 16:
+        header = struct.pack("!BBH", 0x81, 126, len(payload))
+    else:
+        header = struct.pack("!BBQ", 0x81, 127, len(payload))
+    return header + payload
+
+class FakeComfyServer:
+    """
+    Implements /api/prompt, /api/queue, /api/history, /api/view,
+    /upload/image and /ws. Render time is latency ± jitter seconds per prompt,
+    outputs are output_bytes long and failure_rate of prompts end in an
+    error status. busy_seconds accumulates simulated GPU time; GET
+    /fake/stats returns the counters for a server in another process.
+    """
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 1.0,
+        jitter: float = 0.0,
+        output_bytes: int = 1 << 20,
+        failure_rate: float = 0.0,
+        seed: int = None
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.output_bytes = output_bytes
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+
+        self._queue = []  # [(number, prompt_id, prompt, client_id)]
+        self._history = {}
+        self._running = None
+        self._number = 0
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._sockets = {}  # client_id -> [(socket, send lock)]
+
+        self.completed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.bytes_served = 0
+
+        self._http = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._http.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._http.server_address[1]}"
+
+    def start(self) -> "FakeComfyServer":
+        threading.Thread(target=self._http.serve_forever, name=f"fake-http {self.url}", daemon=True).start()
+        threading.Thread(target=self._worker, name=f"fake-gpu {self.url}", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+            sockets = [sock for entries in self._sockets.values() for sock, _ in entries]
+        for sock in sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self._http.shutdown()
+        self._http.server_close()
+
+    # -------------------------
+    # /ws
+    # -------------------------
+
+    def _send(self, client_id: str, msg_type: str, data: dict) -> None:
+        frame = _ws_frame(json.dumps({"type": msg_type, "data": data}))
+        with self._cond:
+            sockets = list(self._sockets.get(client_id, []))
+        for sock, lock in sockets:
+            try:
+                with lock:
+                    sock.sendall(frame)
+            except OSError:
+                pass  # the reader thread drops it once it notices
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {"completed": self.completed, "failed": self.failed,
+                    "busy_seconds": self.busy_seconds, "bytes_served": self.bytes_served}
+
+    def connected_clients(self) -> int:
+        with self._cond:
+            return sum(len(v) for v in self._sockets.values())
+
+    # -------------------------
+    # Simulated execution
+    # -------------------------
+
+    def _outputs(self, prompt_id: str, prompt: dict) -> dict:
+        batch_size = 1
+        for node in prompt.values():
+            if node.get("class_type") == "EmptyLatentImage":
+                batch_size = node.get("inputs", {}).get("batch_size", 1)
+
+        outputs = {}
+        for node_id, node in prompt.items():
+            class_type = node.get("class_type")
+            if class_type == "SaveImage":
+                outputs[node_id] = {"images": [
+                    {"filename": f"{prompt_id}_{i}.png", "subfolder": "", "type": "output"}
+                    for i in range(batch_size)
+                ]}
+            elif class_type == "VHS_VideoCombine" and node.get("inputs", {}).get("save_output", True):
+                outputs[node_id] = {"gifs": [{
+                    "filename": f"{prompt_id}.mp4", "subfolder": "", "type": "output",
+                    "fullpath": f"/fake/output/{prompt_id}.mp4"
+                }]}
+        return outputs
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._queue or self._stopped)
+                if self._stopped:
+                    return
+                self._running = self._queue.pop(0)
+                render = max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter))
+                fail = self._rng.random() < self.failure_rate
+
+            _, prompt_id, prompt, client_id = self._running
+            self._send(client_id, "execution_start", {"prompt_id": prompt_id})
+            for node_id in prompt:
+                self._send(client_id, "executing", {"node": node_id, "prompt_id": prompt_id})
+            time.sleep(render)
+
+            if fail:
+                entry = {"outputs": {}, "status": {"status_str": "error", "completed": False, "messages": [
+                    ["execution_error", {"prompt_id": prompt_id, "exception_message": "simulated failure"}]
+                ]}}
+            else:
+                entry = {"outputs": self._outputs(prompt_id, prompt),
+                         "status": {"status_str": "success", "completed": True, "messages": []}}
+
+            with self._cond:
+                self._history[prompt_id] = entry
+                self._running = None
+                self.busy_seconds += render
+                if fail:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+            if fail:
+                self._send(client_id, "execution_error", {
+                    "prompt_id": prompt_id, "node_id": next(iter(prompt), None), "node_type": "Fake",
+                    "exception_message": "simulated failure"
+                })
+            else:
+                for node_id, output in entry["outputs"].items():
+                    self._send(client_id, "executed", {"node": node_id, "output": output, "prompt_id": prompt_id})
+                self._send(client_id, "execution_success", {"prompt_id": prompt_id})
+            # ComfyUI follows every prompt with executing/node None once the queue item is done
+            self._send(client_id, "executing", {"node": None, "prompt_id": prompt_id})
+
+    # -------------------------
+    # HTTP
+    # -------------------------
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, obj, code: int = 200):
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                path = urlparse(self.path).path
+                if path in ("/prompt", "/api/prompt"):
+                    request = json.loads(body)
+                    prompt = request["prompt"]
+                    prompt_id = str(uuid.uuid4())
+                    with server._cond:
+                        server._number += 1
+                        server._queue.append((server._number, prompt_id, prompt, request.get("client_id")))
+                        server._cond.notify_all()
+                        number = server._number
+                    return self._json({"prompt_id": prompt_id, "number": number, "node_errors": {}})
+                if path in ("/queue", "/api/queue"):
+                    delete = set(json.loads(body or b"{}").get("delete", []))
+                    with server._cond:
+                        server._queue = [item for item in server._queue if item[1] not in delete]
+                    return self._json({})
+                if path in ("/interrupt", "/api/interrupt"):
+                    return self._json({})  # the simulated render can't be cut short
+                if path in ("/upload/image", "/api/upload/image"):
+                    return self._json({"name": "upload", "subfolder": "", "type": "input"})
+                self._json({"error": "not found"}, 404)
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                path = url.path
+                if path == "/fake/stats":
+                    return self._json(server.stats())
+                if path.startswith("/api/"):
+                    path = path[4:]
+
+                if path == "/queue":
+                    with server._cond:
+                        running = [server._running] if server._running else []
+                        pending = list(server._queue)
+                    return self._json({
+                        "queue_running": [[n, pid, {}, {}, []] for n, pid, _, _ in running],
+                        "queue_pending": [[n, pid, {}, {}, []] for n, pid, _, _ in pending]
+                    })
+                if path == "/history":
+                    with server._cond:
+                        return self._json(dict(server._history))
+                if path.startswith("/history/"):
+                    prompt_id = path.rsplit("/", 1)[1]
+                    with server._cond:
+                        entry = server._history.get(prompt_id)
+                    return self._json({prompt_id: entry} if entry else {})
+                if path == "/view":
+                    return self._view(parse_qs(url.query))
+                if path == "/system_stats":
+                    return self._json({"system": {"comfyui_version": "fake"}, "devices": []})
+                if path == "/ws" and self.headers.get("Upgrade", "").lower() == "websocket":
+                    return self._websocket(parse_qs(url.query).get("clientId", [""])[0])
+                self._json({"error": "not found"}, 404)
+
+            def _websocket(self, client_id: str):
+                accept = base64.b64encode(
+                    hashlib.sha1((self.headers["Sec-WebSocket-Key"] + _WS_GUID).encode()).digest()
+                ).decode()
+                self.send_response(101)
+                self.send_header("Upgrade", "websocket")
+                self.send_header("Connection", "Upgrade")
+                self.send_header("Sec-WebSocket-Accept", accept)
+                self.end_headers()
+                self.close_connection = True
+
+                entry = (self.connection, threading.Lock())
+                with server._cond:
+                    server._sockets.setdefault(client_id, []).append(entry)
+                server._send(client_id, "status", {"status": {"exec_info": {"queue_remaining": len(server._queue)}},
+                                                   "sid": client_id})
+                try:
+                    # Only pings and close frames ever come from a client; read until it goes away
+                    while True:
+                        header = self.rfile.read(2)
+                        if len(header) < 2:
+                            break
+                        opcode, length = header[0] & 0x0F, header[1] & 0x7F
+                        if length == 126:
+                            length = struct.unpack("!H", self.rfile.read(2))[0]
+                        elif length == 127:
+                            length = struct.unpack("!Q", self.rfile.read(8))[0]
+                        mask = self.rfile.read(4) if header[1] & 0x80 else b""
+                        payload = self.rfile.read(length)
+                        if opcode == 0x8:
+                            break
+                        if opcode == 0x9:  # ping -> pong with the same payload
+                            if mask:
+                                payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+                            with entry[1]:
+                                self.connection.sendall(struct.pack("!BB", 0x8A, len(payload)) + payload)
+                except OSError:
+                    pass
+                finally:
+                    with server._cond:
+                        server._sockets[client_id].remove(entry)
+
+            def _view(self, query):
+                total = server.output_bytes
+                start = 0
+                match = re.match(r"bytes=(\d+)-", self.headers.get("Range", ""))
+                if match:
+                    start = int(match.group(1))
+                    if start >= total:
+                        self.send_response(416)
+                        self.send_header("Content-Range", f"bytes */{total}")
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{total - 1}/{total}")
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Type", "application/octet-stream")
+                self.send_header("Content-Length", str(total - start))
+                self.end_headers()
+
+                chunk = b"\0" * (1 << 16)
+                remaining = total - start
+                while remaining > 0:
+                    n = min(remaining, len(chunk))
+                    self.wfile.write(chunk[:n])
+                    remaining -= n
+                with server._cond:
+                    server.bytes_served += total - start
+
+        return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a fake ComfyUI server")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds per prompt")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--output-mb", type=float, default=1.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    server = FakeComfyServer(
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        output_bytes=int(args.output_mb * (1 << 20)),
+        failure_rate=args.failure_rate,
+        seed=args.seed
+    ).start()
+    # flush: run_benchmark reads the URL (with --port 0) from this line
+    print(f"[FakeComfy] Listening on {server.url}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
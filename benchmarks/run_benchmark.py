@@ -0,0 +1,237 @@
+"""
+Run AutoGenerator end-to-end against 1..N fake ComfyUI servers and report
+jobs/hour, GPU idle fraction, orchestrator CPU time and peak RSS. Each
+server count runs in its own process so the RSS figures don't bleed over,
+and the fake servers run in processes of their own so CPU and RSS are the
+orchestrator's alone.
+
+    python -m benchmarks.run_benchmark --servers 1,2,4 --latency 2 --videos 20
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _peak_rss_mb():
+    if resource is not None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset / (1 << 20)
+    except (ImportError, AttributeError):
+        return None
+
+class _ServerProcess:
+    """A fake ComfyUI server in a child process (python -m benchmarks.fake_comfy_server)"""
+    def __init__(self, args, seed: int):
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "benchmarks.fake_comfy_server", "--port", "0",
+             "--latency", str(args.latency), "--jitter", str(args.jitter), "--output-mb", str(args.output_mb),
+             "--failure-rate", str(args.failure_rate), "--seed", str(seed)],
+            cwd=REPO_ROOT, stdout=subprocess.PIPE, text=True
+        )
+        line = self.proc.stdout.readline()
+        if "Listening on" not in line:
+            self.proc.kill()
+            raise RuntimeError(f"Fake server failed to start: {line!r}")
+        self.url = line.rsplit(" ", 1)[-1].strip()
+
+    def stats(self) -> dict:
+        return requests.get(f"{self.url}/fake/stats", timeout=10).json()
+
+    def stop(self) -> None:
+        self.proc.terminate()
+        self.proc.wait()
+
+def _make_inputs(root: str, influencers: list, images: int, videos: int, frames: int) -> dict:
+    import cv2
+    import numpy as np
+
+    folders = {"input": os.path.join(root, "input"), "videos": os.path.join(root, "videos"),
+               "backgrounds": os.path.join(root, "backgrounds"), "output": os.path.join(root, "output")}
+    for folder in folders.values():
+        os.makedirs(folder, exist_ok=True)
+
+    for name in influencers:
+        os.makedirs(os.path.join(folders["input"], name), exist_ok=True)
+        for i in range(images):
+            cv2.imwrite(os.path.join(folders["input"], name, f"{i}.png"), np.full((8, 8, 3), i, np.uint8))
+    for i in range(images):
+        cv2.imwrite(os.path.join(folders["backgrounds"], f"bg{i}.png"), np.full((8, 8, 3), i, np.uint8))
+    for i in range(videos):
+        writer = cv2.VideoWriter(
+            os.path.join(folders["videos"], f"clip{i:04d}.mp4"), cv2.VideoWriter_fourcc(*"mp4v"), 16, (16, 16)
+        )
+        for f in range(frames):
+            writer.write(np.full((16, 16, 3), (i + f) % 255, np.uint8))
+        writer.release()
+    return folders
+
+def _bench_config(args, servers: list, folders: dict) -> dict:
+    with open(args.config, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+
+    raw.pop("comfyui_url", None)
+    raw.update({
+        "comfyui_servers": [{"url": s.url, "max_jobs": 1} for s in servers],
+        "queue_ahead": args.queue_ahead,
+        "input_base_folder": folders["input"],
+        "output_base_folder": folders["output"],
+        "use_websocket": not args.poll,
+        "result_cache": False,
+        "upload_inputs": False,
+        "metrics": args.metrics
+    })
+    if args.workflow:
+        raw["active_workflow"] = args.workflow
+
+    for wf in raw["workflows"]:
+        if wf.get("workflow_file"):
+            basename = wf["workflow_file"].replace("\\", "/").rsplit("/", 1)[-1]
+            wf["workflow_file"] = os.path.join(REPO_ROOT, "ComfyUIWorkflows", basename)
+        if "src_video_folder" in wf:
+            wf["src_video_folder"] = folders["videos"]
+        if "background_folder" in wf:
+            wf["background_folder"] = folders["backgrounds"]
+        if wf.get("type") == "t2i":
+            if args.poses:
+                wf["pose_styles"] = wf["pose_styles"][:args.poses]
+            if args.outfits:
+                wf["outfits"] = wf["outfits"][:args.outfits]
+    return raw
+
+def run_once(args, n_servers: int) -> dict:
+    """One end-to-end run of the orchestrator in this process, against n_servers fake server processes"""
+    servers = []
+    try:
+        for i in range(n_servers):
+            servers.append(_ServerProcess(args, seed=i))
+        return _measure(args, servers)
+    finally:
+        for s in servers:
+            s.stop()
+
+def _measure(args, servers: list) -> dict:
+    from clients.comfy_pool import ComfyUIPool
+    from generators.auto_generator import AutoGenerator
+    from models.config_model import Config
+
+    with tempfile.TemporaryDirectory(prefix="comfy-bench-") as root:
+        with open(args.config, "r", encoding="utf-8") as f:
+            influencers = sorted({
+                name for wf in json.load(f)["workflows"] for name in (wf.get("influencers") or [])
+                if isinstance(name, str)
+            })
+        folders = _make_inputs(root, influencers, args.images, args.videos, args.frames)
+        config = Config.from_dict(_bench_config(args, servers, folders))
+
+        cpu_start = time.process_time()
+        wall_start = time.monotonic()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull if not args.verbose else sys.stdout):
+            pool = ComfyUIPool.from_config(config)
+            AutoGenerator(pool, config).run()
+            if pool.metrics:
+                pool.metrics.report()
+            for client in pool.clients:
+                if client.events:
+                    client.events.stop()
+        wall = time.monotonic() - wall_start
+        cpu = time.process_time() - cpu_start
+
+    stats = [s.stats() for s in servers]
+    completed = sum(st["completed"] for st in stats)
+    failed = sum(st["failed"] for st in stats)
+    busy = sum(st["busy_seconds"] for st in stats)
+    n_servers = len(servers)
+    return {
+        "servers": n_servers,
+        "jobs": completed,
+        "failed": failed,
+        "wall_seconds": round(wall, 3),
+        "jobs_per_hour": round(completed / wall * 3600, 1) if wall else 0.0,
+        "gpu_idle_fraction": round(1 - busy / (n_servers * wall), 4) if wall else 0.0,
+        "cpu_seconds": round(cpu, 3),
+        "cpu_per_job_ms": round(cpu / max(1, completed + failed) * 1000, 2),
+        "peak_rss_mb": round(_peak_rss_mb() or 0, 1),
+        "downloaded_mb": round(sum(st["bytes_served"] for st in stats) / (1 << 20), 1)
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the orchestrator against fake ComfyUI servers")
+    parser.add_argument("--servers", default="1,2,4", help="comma-separated server counts, or N for 1..N")
+    parser.add_argument("--config", default=os.path.join(REPO_ROOT, "config.json"))
+    parser.add_argument("--workflow", help="workflow to run (defaults to the config's active_workflow)")
+    parser.add_argument("--latency", type=float, default=1.0, help="simulated render seconds per prompt")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--output-mb", type=float, default=4.0, help="size of each downloaded output")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--queue-ahead", type=int, default=1)
+    parser.add_argument("--videos", type=int, default=8, help="source videos to generate")
+    parser.add_argument("--frames", type=int, default=16, help="frames per generated video")
+    parser.add_argument("--images", type=int, default=2, help="input images per influencer")
+    parser.add_argument("--poses", type=int, help="limit T2I pose styles")
+    parser.add_argument("--outfits", type=int, help="limit T2I outfits")
+    parser.add_argument("--poll", action="store_true", help="wait for prompts by polling history instead of /ws")
+    parser.add_argument("--metrics", action="store_true", help="enable metrics collection during the run")
+    parser.add_argument("--verbose", action="store_true", help="show the generators' own output")
+    parser.add_argument("--json", action="store_true", help="print results as JSON lines")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+
+    if args.child:
+        print(json.dumps(run_once(args, args.child)))
+        return
+
+    if "," in args.servers:
+        counts = [int(n) for n in args.servers.split(",")]
+    else:
+        counts = list(range(1, int(args.servers) + 1))
+
+    child_args = [a for a in sys.argv[1:] if not a.startswith("--servers")]
+    if "--servers" in sys.argv:
+        i = sys.argv.index("--servers")
+        child_args = sys.argv[1:i] + sys.argv[i + 2:]
+
+    results = []
+    for n in counts:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.run_benchmark", *child_args, "--child", str(n)],
+            cwd=REPO_ROOT, capture_output=True, text=True
+        )
+        if out.returncode != 0:
+            print(out.stderr, file=sys.stderr)
+            raise SystemExit(f"Benchmark with {n} server(s) failed")
+        result = json.loads(out.stdout.strip().splitlines()[-1])
+        results.append(result)
+        if args.json:
+            print(json.dumps(result))
+
+    if not args.json:
+        print(f"{'servers':>7} {'jobs':>6} {'failed':>6} {'wall':>8} {'jobs/h':>9} {'GPU idle':>9} "
+              f"{'CPU s':>7} {'CPU/job':>8} {'peak RSS':>9}")
+        for r in results:
+            print(
+                f"{r['servers']:>7} {r['jobs']:>6} {r['failed']:>6} {r['wall_seconds']:>7.1f}s "
+                f"{r['jobs_per_hour']:>9.0f} {r['gpu_idle_fraction']:>9.1%} {r['cpu_seconds']:>7.2f} "
+                f"{r['cpu_per_job_ms']:>6.1f}ms {r['peak_rss_mb']:>7.0f}MB"
+            )
+
+if __name__ == "__main__":
+    main()
@@ -1,129 +1,544 @@
-import json
+import math
 import os
+import threading
 import time
 import requests
-import cv2
-import math
+import uuid
+from requests.adapters import HTTPAdapter
+from dataclasses import dataclass
 from datetime import datetime
+from typing import Callable
+from clients.comfy_events import ComfyEventListener
+from clients.input_uploader import InputUploader
 from models.config_model import Workflow
+from utils.download_utils import retrieve_local, stream_download
+from utils.metrics import Metrics
+from utils.result_cache import ResultCache
+from utils.video_probe import VideoProbeIndex
+from utils.workflow_cache import WorkflowTemplateCache, WorkflowView
+
+HTTP_TIMEOUT = (10, 60)  # (connect, read) seconds for API calls; a hung server must not hang its callers
+
+class ServerUnavailable(RuntimeError):
+    """The server stopped answering or was taken out of rotation; the job can run elsewhere"""
+
+class PromptTimeout(ServerUnavailable):
+    """A prompt ran past its deadline"""
+
+class JobCancelled(RuntimeError):
+    """The job was cancelled through the pool (control endpoint, lane cancel or Ctrl+C)"""
+
+def make_session(pool_size: int = 8) -> requests.Session:
+    """requests.Session keeping up to pool_size keep-alive connections to one server"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@dataclass
+class PendingPrompt:
+    """A prompt queued on a ComfyUI server whose outputs haven't been fetched yet"""
+    client: "ComfyUIClient"
+    prompt_id: str
+    fetch_outputs: Callable[[dict], str]
+    use_events: bool = True  # False for prompts queued by an earlier process (other client_id)
+    cached: bool = False  # served from the result cache; nothing was sent to the server
+
+    def wait(self, timeout: float = None, cancel: threading.Event = None) -> dict:
+        """
+        Block until the server has finished the prompt and return its history entry.
+        Past timeout seconds, or once cancel is set, the prompt is removed from
+        the server and PromptTimeout / JobCancelled raised.
+        """
+        if self.cached:
+            return {}
+        metrics = self.client.metrics
+        try:
+            result = self.client._wait_for_result(
+                self.prompt_id, use_events=self.use_events, timeout=timeout, cancel=cancel
+            )
+        except Exception:
+            if metrics:
+                metrics.prompt_finished(self.prompt_id, ok=False)
+            raise
+        if metrics:
+            metrics.prompt_finished(self.prompt_id)
+        return result
+
+    def collect(self) -> str:
+        return self.fetch_outputs(self.wait())
 
 class ComfyUIClient:
-    def __init__(self, comfy_url: str, output_folder: str):
+    def __init__(
+        self,
+        comfy_url: str,
+        output_folder: str,
+        use_websocket: bool = True,
+        template_cache: WorkflowTemplateCache = None,
+        video_probe: VideoProbeIndex = None,
+        uploader: InputUploader = None,
+        server_input_dir: str = None,
+        result_cache: ResultCache = None,
+        session: requests.Session = None,
+        metrics: Metrics = None,
+        shared_output_dir: str = None,
+        move_outputs: bool = False
+    ):
         self.comfy_url = comfy_url.rstrip("/")
         self.output_folder = output_folder
 
-    def load_workflow(self, workflow_path: str):
-        with open(workflow_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        # Shared by every thread talking to this server so connections are reused
+        self.session = session or make_session()
+        self.template_cache = template_cache or WorkflowTemplateCache()
+        self.video_probe = video_probe or VideoProbeIndex()
+
+        # When set, inputs are uploaded instead of injected as local paths
+        self.uploader = uploader
+        self.server_input_dir = server_input_dir
+
+        self.result_cache = result_cache
+
+        # Server's output folder as seen from here; outputs found there skip /api/view
+        self.shared_output_dir = shared_output_dir
+        self.move_outputs = move_outputs
+
+        # One /ws connection per server; prompts are posted under its client_id
+        self.client_id = uuid.uuid4().hex
+        self.events = None
+        if use_websocket and ComfyEventListener.available():
+            self.events = ComfyEventListener(self.comfy_url, self.client_id)
+
+        # Set by the pool's health checks while the server is out of rotation
+        self.down = threading.Event()
+        # Prompts failed over while the server was unreachable; cancelled once it's back
+        self._abandoned = set()
+        self._abandoned_lock = threading.Lock()
+
+        self.metrics = metrics
+        if self.metrics and self.events:
+            # Node-level timings come from the same /ws stream
+            self.events.add_callback(self.metrics.on_event)
+
+    def load_workflow(self, workflow_path: str) -> WorkflowView:
+        """Copy-on-write view of the cached template; patch it with set_input()"""
+        return self.template_cache.view(workflow_path)
 
     def _post_workflow(self, workflow: dict):
+        if self.events:
+            # Connect before posting so the completion message can't be missed
+            self.events.start()
         url = f"{self.comfy_url}/api/prompt"
-        response = requests.post(url, json={"prompt": workflow})
+        response = self.session.post(url, json={"prompt": workflow, "client_id": self.client_id}, timeout=HTTP_TIMEOUT)
         if response.status_code != 200:
             raise RuntimeError(f"Error sending workflow: {response.text}")
-        return response.json()["prompt_id"]
+        prompt_id = response.json()["prompt_id"]
+        if self.events:
+            self.events.watch(prompt_id)
+        if self.metrics:
+            self.metrics.prompt_posted(prompt_id, self.comfy_url, workflow)
+        return prompt_id
+
+    def _get_history(self, prompt_id: str):
+        r = self.session.get(f"{self.comfy_url}/api/history/{prompt_id}", timeout=HTTP_TIMEOUT)
+        if r.status_code == 200:
+            data = r.json()
+            if prompt_id in data:
+                return data[prompt_id]
+        return None
+
+    @staticmethod
+    def _check_entry(prompt_id: str, entry: dict) -> dict:
+        """History entry of a finished prompt, raising if ComfyUI recorded an execution error"""
+        status = entry.get("status") or {}
+        if status.get("status_str") == "error":
+            details = next(
+                (data for kind, data in status.get("messages", []) if kind == "execution_error"), {}
+            )
+            raise RuntimeError(f"Prompt {prompt_id} failed: {details.get('exception_message', 'execution error')}")
+        return entry
+
+    def _wait_for_result(
+        self,
+        prompt_id: str,
+        ws_recheck_seconds: float = 10.0,
+        use_events: bool = True,
+        timeout: float = None,
+        cancel: threading.Event = None
+    ):
+        deadline = time.monotonic() + timeout if timeout else None
+
+        def check_abort():
+            if cancel is not None and cancel.is_set():
+                self.cancel_prompt(prompt_id)
+                raise JobCancelled(f"Prompt {prompt_id} on {self.comfy_url} was cancelled")
+            if self.down.is_set():
+                # The job is retried elsewhere; don't let this copy render too if the server recovers
+                if not self.cancel_prompt(prompt_id, timeout=(3, 5)):
+                    with self._abandoned_lock:
+                        self._abandoned.add(prompt_id)
+                raise ServerUnavailable(f"{self.comfy_url} was taken out of rotation")
+            if deadline and time.monotonic() > deadline:
+                self.cancel_prompt(prompt_id)
+                raise PromptTimeout(f"Prompt {prompt_id} on {self.comfy_url} exceeded its {timeout:.0f}s deadline")
+
+        if use_events and self.events and self.events.connected:
+            try:
+                recheck_at = time.monotonic() + ws_recheck_seconds
+                while self.events.connected:
+                    check_abort()
+                    # Wake up every second so a cancel, a trip or the deadline isn't missed by much
+                    wait = 1.0 if deadline is None else min(1.0, max(0.0, deadline - time.monotonic()))
+                    state = self.events.wait(prompt_id, timeout=wait)
+                    if state.error:
+                        raise RuntimeError(f"Prompt {prompt_id} failed: {state.error}")
+                    if state.done:
+                        break
+                    if time.monotonic() < recheck_at:
+                        continue
+                    recheck_at = time.monotonic() + ws_recheck_seconds
+                    # Safety net for a message lost around a reconnect
+                    try:
+                        entry = self._get_history(prompt_id)
+                    except requests.RequestException:
+                        continue
+                    if entry is not None:
+                        return self._check_entry(prompt_id, entry)
+            finally:
+                self.events.forget(prompt_id)
 
-    def _wait_for_result(self, prompt_id: str):
-        history_url = f"{self.comfy_url}/api/history/{prompt_id}"
+        # Polling fallback with exponential backoff; the health checks decide when the server is gone
+        if self.events:
+            self.events.forget(prompt_id)
+        delay = 0.25
         while True:
-            time.sleep(0.5)
-            r = requests.get(history_url)
-            if r.status_code == 200:
-                data = r.json()
-                if prompt_id in data:
-                    return data[prompt_id]
+            check_abort()
+            try:
+                entry = self._get_history(prompt_id)
+            except requests.RequestException:
+                entry = None
+            if entry is not None:
+                return self._check_entry(prompt_id, entry)
+            time.sleep(delay)
+            delay = min(delay * 1.5, 5.0)
+
+    def cancel_prompt(self, prompt_id: str, timeout: tuple = HTTP_TIMEOUT) -> bool:
+        """Best effort: drop the prompt from the queue, or interrupt it if it is the one running"""
+        try:
+            r = self.session.get(f"{self.comfy_url}/api/queue", timeout=timeout)
+            running = [item[1] for item in r.json().get("queue_running", [])] if r.status_code == 200 else []
+            if prompt_id in running:
+                r = self.session.post(f"{self.comfy_url}/api/interrupt", json={"prompt_id": prompt_id}, timeout=timeout)
+            else:
+                r = self.session.post(f"{self.comfy_url}/api/queue", json={"delete": [prompt_id]}, timeout=timeout)
+            if r.status_code != 200:
+                raise ValueError(f"{r.status_code} {r.text[:200]}")
+            return True
+        except (requests.RequestException, ValueError) as e:
+            print(f"[ComfyUI] ✖ Couldn't cancel {prompt_id} on {self.comfy_url}: {e}")
+            return False
+
+    def cancel_abandoned(self) -> None:
+        """Cancel prompts whose jobs failed over while the server was unreachable"""
+        with self._abandoned_lock:
+            abandoned, self._abandoned = self._abandoned, set()
+        for prompt_id in abandoned:
+            if not self.cancel_prompt(prompt_id):
+                with self._abandoned_lock:
+                    self._abandoned.add(prompt_id)
+
+    def check_health(self) -> None:
+        """Raise unless the server answers /system_stats and /api/queue"""
+        for path in ("/system_stats", "/api/queue"):
+            r = self.session.get(f"{self.comfy_url}{path}", timeout=(5, 10))
+            if r.status_code != 200:
+                raise ServerUnavailable(f"{path} returned {r.status_code}")
+            r.json()
+
+    def prompt_known(self, prompt_id: str) -> bool:
+        """Whether the server still has the prompt queued, running or in its history"""
+        if self._get_history(prompt_id) is not None:
+            return True
+        r = self.session.get(f"{self.comfy_url}/api/queue", timeout=HTTP_TIMEOUT)
+        if r.status_code != 200:
+            return False
+        data = r.json()
+        return any(
+            item[1] == prompt_id
+            for item in data.get("queue_running", []) + data.get("queue_pending", [])
+        )
+
+    def get_queue_depth(self) -> int:
+        """Number of prompts running or pending on the server"""
+        r = self.session.get(f"{self.comfy_url}/api/queue", timeout=HTTP_TIMEOUT)
+        if r.status_code != 200:
+            raise RuntimeError(f"Error reading queue: {r.text}")
+        data = r.json()
+        return len(data.get("queue_running", [])) + len(data.get("queue_pending", []))
 
     def submit_workflow(self, workflow: dict):
         prompt_id = self._post_workflow(workflow)
         return self._wait_for_result(prompt_id)
 
-    def _download_file(self, filename: str, save_path: str):
-        url = f"{self.comfy_url}/api/view?filename={filename}&type=output"
-        r = requests.get(url)
-        if r.status_code != 200:
-            raise RuntimeError(f"Error downloading file: {r.text}")
-        with open(save_path, "wb") as f:
-            f.write(r.content)
+    def _download_file(self, filename: str, save_path: str, subfolder: str = ""):
+        if self.shared_output_dir:
+            local_path = os.path.join(self.shared_output_dir, subfolder or "", os.path.basename(filename))
+            method = retrieve_local(local_path, save_path, move=self.move_outputs)
+            if method:
+                if self.metrics:
+                    self.metrics.incr("outputs_local", server=self.comfy_url, method=method)
+                return
+        if self.metrics:
+            with self.metrics.span("download", server=self.comfy_url):
+                self._stream_output(filename, save_path)
+        else:
+            self._stream_output(filename, save_path)
 
-    @staticmethod
-    def get_frame_count_for_16fps(video_path: str) -> int:
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise RuntimeError(f"Failed to open video: {video_path}")
-        orig_fps = cap.get(cv2.CAP_PROP_FPS)
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        cap.release()
-        return math.ceil(total_frames * 16 / orig_fps)
+    def _stream_output(self, filename: str, save_path: str):
+        stream_download(
+            f"{self.comfy_url}/api/view",
+            save_path,
+            params={"filename": filename, "type": "output"},
+            session=self.session
+        )
 
+    def _server_input(self, workflow_data: WorkflowView, node_id, local_path: str) -> str:
+        """Value to inject into a loader node for a local input file"""
+        if not self.uploader:
+            return local_path
+        name = self.uploader.server_name(local_path)
+        if workflow_data[str(node_id)]["class_type"].endswith("Path"):
+            # Path-style loaders (VHS_LoadVideoPath) take an absolute path on the server
+            if not self.server_input_dir:
+                raise ValueError(
+                    f"Node {node_id} loads by path; set input_dir for {self.comfy_url} to use uploads"
+                )
+            return f"{self.server_input_dir.rstrip('/')}/{name}"
+        return name
 
-    def generate_animate_workflow(self, workflow: Workflow, inputs: dict, output_subfolder: str):
-        if workflow.type != "v2v":
-            raise ValueError("generate_animate_workflow only supports V2V workflows")
+    def _cached_prompt(self, cache_key: str, suffixes: list, make_output_paths: Callable[[], list]):
+        """
+        PendingPrompt for results already in the cache, or None on a miss.
+        suffixes name each cached file (one per output); fetch_outputs returns the list of paths.
+        """
+        if not self.result_cache or not all(self.result_cache.lookup(cache_key, sfx) for sfx in suffixes):
+            return None
 
-        workflow_data = self.load_workflow(workflow.workflow_file)
+        def fetch_outputs(result: dict) -> list:
+            output_paths = make_output_paths()
+            for sfx, output_path in zip(suffixes, output_paths):
+                if not self.result_cache.fetch(cache_key, sfx, output_path):
+                    raise RuntimeError(f"Cached result {cache_key} was evicted before it could be used")
+            print(f"[ResultCache] ✔ Reused {cache_key[:12]} → {', '.join(output_paths)}")
+            return output_paths
+
+        return PendingPrompt(self, f"cache-{cache_key[:12]}", fetch_outputs, use_events=False, cached=True)
+
+    def get_frame_count_for_16fps(self, video_path: str) -> int:
+        return self.video_probe.frame_count_at(video_path, fps=16)
+
+
+    def _animate_output_path(self, output_subfolder: str, tag: str) -> str:
+        output_dir = os.path.join(self.output_folder, output_subfolder)
+        os.makedirs(output_dir, exist_ok=True)
+        # tag (prompt_id) suffix keeps parallel jobs finishing in the same second apart
+        return os.path.join(output_dir, datetime.now().strftime("%Y%m%d_%H%M%S") + f"_{tag[:8]}.mp4")
 
+    @staticmethod
+    def _input_slots(workflow: Workflow, inputs: dict):
+        """(node_id, input name, local path) of every file input the workflow takes"""
         for key, node_id in workflow.inputs.items():
             if key in inputs:
-                node_input_name = "image" if key in ("person", "background") else "video"
-                workflow_data[str(node_id)]["inputs"][node_input_name] = inputs[key]
+                yield node_id, "image" if key in ("person", "background") else "video", inputs[key]
+
+    def _place_inputs(self, workflow: Workflow, workflow_data: WorkflowView, inputs: dict) -> None:
+        """Swap the local input paths for what the server loads, uploading them if needed"""
+        if not self.uploader:
+            return
+        for node_id, node_input_name, local_path in self._input_slots(workflow, inputs):
+            workflow_data.set_input(node_id, node_input_name, self._server_input(workflow_data, node_id, local_path))
+
+    def _patch_animate_workflow(self, workflow: Workflow, inputs: dict, segment: tuple = None) -> WorkflowView:
+        """
+        segment is (skip_first_frames, frame_load_cap) in the video loader's frames.
+        Inputs are left as local paths; see _place_inputs.
+        """
+        workflow_data = self.load_workflow(workflow.workflow_file)
+
+        for node_id, node_input_name, local_path in self._input_slots(workflow, inputs):
+            workflow_data.set_input(node_id, node_input_name, local_path)
 
         video_path = inputs.get("video")
-        if video_path:
-            if "num_frames" in workflow.inputs:
+        loader_fps = None
+        if segment:
+            video_node = workflow.inputs["video"]
+            skip, cap = segment
+            workflow_data.set_input(video_node, "skip_first_frames", skip)
+            workflow_data.set_input(video_node, "frame_load_cap", cap)
+            loader_fps = float(workflow_data[str(video_node)]["inputs"].get("force_rate") or 0)
+            loader_fps = loader_fps or self.video_probe.get(video_path)["fps"]
+
+        if video_path and ("num_frames" in workflow.inputs or "frame_window_size" in workflow.inputs):
+            if segment:
+                frame_count = math.ceil(segment[1] * 16 / loader_fps)
+            else:
                 frame_count = self.get_frame_count_for_16fps(video_path)
-                workflow_data[str(workflow.inputs["num_frames"])]["inputs"]["num_frames"] = frame_count
+            if "num_frames" in workflow.inputs:
+                workflow_data.set_input(workflow.inputs["num_frames"], "num_frames", frame_count)
             if "frame_window_size" in workflow.inputs:
-                workflow_data[str(workflow.inputs["frame_window_size"])]["inputs"]["frame_window_size"] = frame_count
+                workflow_data.set_input(workflow.inputs["frame_window_size"], "frame_window_size", frame_count)
+
+        return workflow_data
 
-        result = self.submit_workflow(workflow_data)
+    def queue_animate_workflow(
+        self,
+        workflow: Workflow,
+        inputs: dict,
+        output_subfolder: str,
+        prompt_id: str = None,
+        segment: tuple = None
+    ) -> PendingPrompt:
+        """
+        Patch and post the workflow; pass prompt_id to reattach to one already on the server.
+        segment (skip_first_frames, frame_load_cap) renders just that slice of the video.
+        """
+        if workflow.type != "v2v":
+            raise ValueError("generate_animate_workflow only supports V2V workflows")
 
-        output_info = result["outputs"][str(workflow.output_node)]["gifs"][0]
-        remote_path = output_info["fullpath"]
+        def make_output_path(tag: str) -> str:
+            return self._animate_output_path(output_subfolder, tag)
 
-        output_dir = os.path.join(self.output_folder, output_subfolder)
-        os.makedirs(output_dir, exist_ok=True)
+        reattach = prompt_id is not None
+        cache_key = None
+        if not reattach:
+            start = time.monotonic()
+            workflow_data = self._patch_animate_workflow(workflow, inputs, segment)
+            # Keyed on local content hashes, so a hit never uploads anything
+            if self.result_cache:
+                cache_key = self.result_cache.key(workflow_data, inputs.values())
+            if cache_key:
+                cached = self._cached_prompt(cache_key, [".mp4"], lambda: [make_output_path(cache_key)])
+                if cached:
+                    if self.metrics:
+                        self.metrics.observe("prep", time.monotonic() - start, workflow=workflow.name)
+                    fetch_all = cached.fetch_outputs
+                    cached.fetch_outputs = lambda result: fetch_all(result)[0]
+                    return cached
+            self._place_inputs(workflow, workflow_data, inputs)
+            if self.metrics:
+                self.metrics.observe("prep", time.monotonic() - start, workflow=workflow.name)
+            prompt_id = self._post_workflow(workflow_data)
 
-        output_file = os.path.join(
-            output_dir,
-            datetime.now().strftime("%Y%m%d_%H%M%S") + ".mp4"
-        )
+        def fetch_outputs(result: dict) -> str:
+            output_info = result["outputs"][str(workflow.output_node)]["gifs"][0]
+            remote_path = output_info["fullpath"]
 
-        self._download_file(remote_path, output_file)
-        return output_file
+            output_file = make_output_path(prompt_id)
+            self._download_file(remote_path, output_file, subfolder=output_info.get("subfolder", ""))
+            if cache_key:
+                self.result_cache.store(cache_key, ".mp4", output_file)
+            return output_file
 
+        return PendingPrompt(self, prompt_id, fetch_outputs, use_events=not reattach)
 
+    def generate_animate_workflow(self, workflow: Workflow, inputs: dict, output_subfolder: str):
+        return self.queue_animate_workflow(workflow, inputs, output_subfolder).collect()
 
-    def generate_text2image(
+    def _patch_text2image_workflow(
         self,
         workflow: Workflow,
         prompt: str,
         loras: list[str],
         seed: int,
-        output_path: str
-    ):
-        if workflow.type != "t2i":
-            raise ValueError("generate_text2image only supports T2I workflows")
-
+        batch_size: int = 1
+    ) -> WorkflowView:
         workflow_data = self.load_workflow(workflow.workflow_file)
 
         nodes = workflow.to_text2image_nodes()
 
-        workflow_data[str(nodes["prompt"])]["inputs"]["text"] = prompt
-        workflow_data[str(nodes["seed"])]["inputs"]["seed"] = seed
+        workflow_data.set_input(nodes["prompt"], "text", prompt)
+        workflow_data.set_input(nodes["seed"], "seed", seed)
 
         if loras:
-            lora_node_id = str(nodes["lora"])
-            lora_inputs = workflow_data[lora_node_id]["inputs"]
+            workflow_data.set_input(nodes["lora"], "lora_name", loras[0])
 
-            lora_inputs["lora_name"] = loras[0]
+        if batch_size > 1:
+            if not nodes["latent"]:
+                raise ValueError("Batched T2I needs latent_node_id set on the workflow")
+            workflow_data.set_input(nodes["latent"], "batch_size", batch_size)
 
+        return workflow_data
 
-        prompt_id = self._post_workflow(workflow_data)
-        result = self._wait_for_result(prompt_id)
+    def queue_text2image_batch(
+        self,
+        workflow: Workflow,
+        prompt: str,
+        loras: list[str],
+        seed: int,
+        output_paths: list[str],
+        prompt_id: str = None
+    ) -> PendingPrompt:
+        """
+        Render len(output_paths) variants of one prompt in a single submission by
+        driving the latent batch_size; fetch_outputs returns the list of paths.
+        Pass prompt_id to reattach to a prompt already on the server.
+        """
+        if workflow.type != "t2i":
+            raise ValueError("generate_text2image only supports T2I workflows")
 
-        node_out = result["outputs"]["150"] 
-        image_name = node_out["images"][0]["filename"]
+        batch_size = len(output_paths)
+        suffixes = [f"_{i}{os.path.splitext(p)[1] or '.png'}" for i, p in enumerate(output_paths)]
+        output_node = str(workflow.output_node or 150)
 
-        self._download_file(image_name, output_path)
-        return output_path
+        reattach = prompt_id is not None
+        cache_key = None
+        if not reattach:
+            start = time.monotonic()
+            workflow_data = self._patch_text2image_workflow(workflow, prompt, loras, seed, batch_size)
+            if self.result_cache:
+                cache_key = self.result_cache.key(workflow_data, [])
+            if self.metrics:
+                self.metrics.observe("prep", time.monotonic() - start, workflow=workflow.name)
+            if cache_key:
+                cached = self._cached_prompt(cache_key, suffixes, lambda: output_paths)
+                if cached:
+                    return cached
+            prompt_id = self._post_workflow(workflow_data)
 
+        def fetch_outputs(result: dict) -> list:
+            images = result["outputs"][output_node]["images"]
+            if len(images) < batch_size:
+                raise RuntimeError(f"Expected {batch_size} images from node {output_node}, got {len(images)}")
+
+            for image, sfx, output_path in zip(images, suffixes, output_paths):
+                self._download_file(image["filename"], output_path, subfolder=image.get("subfolder", ""))
+                if cache_key:
+                    self.result_cache.store(cache_key, sfx, output_path)
+            return output_paths
+
+        return PendingPrompt(self, prompt_id, fetch_outputs, use_events=not reattach)
+
+    def queue_text2image(
+        self,
+        workflow: Workflow,
+        prompt: str,
+        loras: list[str],
+        seed: int,
+        output_path: str,
+        prompt_id: str = None
+    ) -> PendingPrompt:
+        """Single-image queue_text2image_batch; fetch_outputs returns the one path"""
+        pending = self.queue_text2image_batch(workflow, prompt, loras, seed, [output_path], prompt_id)
+        fetch_all = pending.fetch_outputs
+        pending.fetch_outputs = lambda result: fetch_all(result)[0]
+        return pending
+
+    def generate_text2image(
+        self,
+        workflow: Workflow,
+        prompt: str,
+        loras: list[str],
+        seed: int,
+        output_path: str
+    ):
+        return self.queue_text2image(workflow, prompt, loras, seed, output_path).collect()
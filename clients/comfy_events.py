@@ -0,0 +1,183 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+try:
+    import websocket  # websocket-client
+except ImportError:
+    websocket = None
+
+class PromptState:
+    """What the /ws stream has told us about one prompt"""
+    def __init__(self):
+        self.done = False
+        self.error: Optional[str] = None
+        self.current_node: Optional[str] = None
+        self.progress: Optional[tuple] = None  # (value, max) of the running node
+
+class ComfyEventListener:
+    """
+    Shared /ws?clientId= connection to one ComfyUI server.
+    ComfyUI only sends execution messages to the client_id that queued the
+    prompt, so every prompt posted by a ComfyUIClient must carry the same
+    client_id as its listener.
+    """
+    def __init__(self, comfy_url: str, client_id: str, reconnect_max_seconds: float = 30.0):
+        scheme, rest = comfy_url.split("://", 1)
+        ws_scheme = "wss" if scheme == "https" else "ws"
+        self.ws_url = f"{ws_scheme}://{rest}/ws?clientId={client_id}"
+        self.reconnect_max_seconds = reconnect_max_seconds
+
+        self.connected = False
+        self._attempted = False
+        self._states: Dict[str, PromptState] = {}
+        # Messages for prompts nobody is watching: either a fast prompt that
+        # finished before its POST returned, or leftovers after forget().
+        # Kept briefly for watch(), and bounded so they can't pile up.
+        self._unclaimed: "OrderedDict[str, PromptState]" = OrderedDict()
+        self.unclaimed_limit = 256
+        self._callbacks: List[Callable[[str, dict], None]] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    @staticmethod
+    def available() -> bool:
+        return websocket is not None
+
+    def add_callback(self, callback: Callable[[str, dict], None]) -> None:
+        """Call callback(msg_type, data) for every JSON message received"""
+        self._callbacks.append(callback)
+
+    def start(self, connect_timeout: float = 5.0) -> bool:
+        """Start the reader thread (once) and wait briefly for the first connection"""
+        if websocket is None:
+            return False
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=f"comfy-ws {self.ws_url}", daemon=True)
+                self._thread.start()
+                # Only the first caller waits; later posts just use whatever state we're in
+                self._cond.wait_for(lambda: self._attempted, timeout=connect_timeout)
+            return self.connected
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    # -------------------------
+    # Waiting
+    # -------------------------
+
+    def _state(self, prompt_id: str) -> PromptState:
+        state = self._states.get(prompt_id)
+        if state is None:
+            state = self._states[prompt_id] = PromptState()
+        return state
+
+    def watch(self, prompt_id: str) -> None:
+        """Start collecting messages for a prompt just posted; others are ignored"""
+        with self._cond:
+            self._states[prompt_id] = self._unclaimed.pop(prompt_id, None) or PromptState()
+
+    def wait(self, prompt_id: str, timeout: float) -> PromptState:
+        """
+        Wait up to timeout seconds for the prompt to finish.
+        Returns early (with done False) if the connection drops.
+        """
+        with self._cond:
+            state = self._state(prompt_id)
+            self._cond.wait_for(lambda: state.done or not self.connected, timeout=timeout)
+            return state
+
+    def forget(self, prompt_id: str) -> None:
+        with self._cond:
+            self._states.pop(prompt_id, None)
+
+    # -------------------------
+    # Reader thread
+    # -------------------------
+
+    def _set_connected(self, connected: bool) -> None:
+        with self._cond:
+            self.connected = connected
+            self._attempted = True
+            self._cond.notify_all()
+
+    def _run(self) -> None:
+        backoff = 0.5
+        warned = False
+        while not self._stopped:
+            try:
+                ws = websocket.create_connection(self.ws_url, timeout=10)
+            except Exception as e:
+                if not warned:
+                    print(f"[ComfyWS] ✖ Could not connect to {self.ws_url}, polling history instead: {e}")
+                    warned = True
+                self._set_connected(False)
+                time.sleep(backoff)
+                backoff = min(backoff * 2, self.reconnect_max_seconds)
+                continue
+
+            backoff = 0.5
+            warned = False
+            ws.settimeout(30)
+            self._set_connected(True)
+            try:
+                while not self._stopped:
+                    try:
+                        message = ws.recv()
+                    except websocket.WebSocketTimeoutException:
+                        continue
+                    # Binary frames are latent previews; only JSON text matters here
+                    if isinstance(message, str):
+                        self._handle(json.loads(message))
+            except Exception as e:
+                if not self._stopped:
+                    print(f"[ComfyWS] ✖ Connection to {self.ws_url} lost: {e}")
+            finally:
+                self._set_connected(False)
+                try:
+                    ws.close()
+                except Exception:
+                    pass
+
+    def _handle(self, message: dict) -> None:
+        msg_type = message.get("type")
+        data = message.get("data") or {}
+        prompt_id = data.get("prompt_id")
+
+        for callback in self._callbacks:
+            try:
+                callback(msg_type, data)
+            except Exception as e:
+                print(f"[ComfyWS] ✖ Event callback failed: {e}")
+
+        if not prompt_id:
+            return
+
+        with self._cond:
+            state = self._states.get(prompt_id)
+            if state is None:
+                state = self._unclaimed.pop(prompt_id, None) or PromptState()
+                self._unclaimed[prompt_id] = state
+                while len(self._unclaimed) > self.unclaimed_limit:
+                    self._unclaimed.popitem(last=False)
+            if msg_type == "executing":
+                # node None means the whole prompt has finished
+                if data.get("node") is None:
+                    state.done = True
+                else:
+                    state.current_node = str(data["node"])
+            elif msg_type == "execution_success":
+                state.done = True
+            elif msg_type == "progress":
+                state.progress = (data.get("value"), data.get("max"))
+            elif msg_type in ("execution_error", "execution_interrupted"):
+                state.error = (
+                    f"{msg_type} in node {data.get('node_id')} ({data.get('node_type')}): "
+                    f"{data.get('exception_message', 'interrupted')}"
+                )
+                state.done = True
+            self._cond.notify_all()
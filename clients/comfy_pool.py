@@ -0,0 +1,780 @@
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import requests
+from clients.comfy_client import ComfyUIClient, JobCancelled, PendingPrompt, ServerUnavailable, make_session
+from clients.input_uploader import InputUploader
+from models.config_model import Config, ComfyServer, Workflow
+from utils.affinity import AffinityPicker
+from utils.cost_model import CostModel, CostPlan, template_profile
+from utils.file_hash import FileHashCache
+from utils.job_journal import DONE, QUEUED, JobJournal, in_shard
+from utils.lanes import DEFAULT_LANE, LaneClosed, LaneScheduler
+from utils.metrics import Metrics
+from utils.result_cache import ResultCache
+from utils.video_probe import VideoProbeIndex
+from utils.video_transcode import VideoTranscoder
+from utils.workflow_cache import WorkflowTemplateCache
+
+def _outputs_exist(output) -> bool:
+    paths = output if isinstance(output, list) else [output]
+    return bool(paths) and all(p and os.path.exists(p) for p in paths)
+
+class ComfyUIPool:
+    """
+    Spreads jobs over several ComfyUI servers.
+    Each job goes to the server with the lowest load, where load is the jobs we
+    have in flight there plus whatever else is sitting in its /api/queue.
+
+    A server slot is held from submission until the server finishes the prompt;
+    downloads happen afterwards on a separate worker pool, so with queue_ahead
+    set the next prompt is already waiting on the server when one completes.
+    """
+    def __init__(
+        self,
+        servers: List[ComfyServer],
+        output_folder: str,
+        queue_refresh_seconds: float = 2.0,
+        download_workers: int = 4,
+        use_websocket: bool = True,
+        cache_folder: str = None,
+        upload_inputs: bool = False,
+        result_cache_max_bytes: int = None,
+        affinity_window: int = 64,
+        metrics: Metrics = None,
+        job_timeout: float = None,
+        timeout_factor: float = 3.0,
+        health_interval: float = 15.0,
+        failure_threshold: int = 3,
+        breaker_cooldown: float = 60.0,
+        max_retries: int = 3,
+        lanes: Dict[str, float] = None
+    ):
+        if not servers:
+            raise ValueError("ComfyUIPool needs at least one server")
+
+        self.output_folder = output_folder
+        self.queue_refresh_seconds = queue_refresh_seconds
+        self.download_workers = download_workers
+        self.affinity_window = affinity_window
+        self.metrics = metrics
+
+        # Deadlines, health checks and failover; see _deadline() and _health_loop()
+        self.job_timeout = job_timeout
+        self.timeout_factor = timeout_factor
+        self.health_interval = health_interval
+        self.failure_threshold = failure_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.max_retries = max_retries
+
+        # One parsed copy of each workflow template shared by every server
+        self.template_cache = WorkflowTemplateCache()
+        self.video_probe = VideoProbeIndex(
+            os.path.join(cache_folder, "video_probe.json") if cache_folder else None
+        )
+
+        self.file_hashes = FileHashCache(
+            os.path.join(cache_folder, "file_hashes.json") if cache_folder else None
+        )
+        self.upload_inputs = upload_inputs
+        self.cache_folder = cache_folder
+
+        # Render-time model fitted from past jobs; see render_cost()
+        self.cost_model = CostModel(os.path.join(cache_folder, "cost_model.json") if cache_folder else None)
+        self._profiles = {}
+        self._unsized = set()
+        self._last_finish = {}  # server -> when its previous prompt finished, to time renders behind it
+
+        # Needs somewhere to live; result_cache_max_bytes None or 0 disables it
+        self.result_cache = None
+        if cache_folder and result_cache_max_bytes:
+            self.result_cache = ResultCache(
+                os.path.join(cache_folder, "results"), self.file_hashes, result_cache_max_bytes
+            )
+
+        self.clients: List[ComfyUIClient] = []
+        self._capacity = {}
+        for s in servers:
+            capacity = max(1, s.max_jobs) + max(0, s.queue_ahead or 0)
+            # Every slot's thread plus the download workers may talk to a server at once
+            session = make_session(pool_size=capacity + download_workers)
+            url = s.url.rstrip("/")
+            self.clients.append(ComfyUIClient(
+                comfy_url=url,
+                output_folder=output_folder,
+                use_websocket=use_websocket,
+                template_cache=self.template_cache,
+                video_probe=self.video_probe,
+                uploader=InputUploader(url, self.file_hashes, cache_folder, session=session) if upload_inputs else None,
+                server_input_dir=s.input_dir,
+                result_cache=self.result_cache,
+                session=session,
+                metrics=metrics,
+                shared_output_dir=s.output_dir,
+                move_outputs=s.move_outputs
+            ))
+            self._capacity[url] = capacity
+        self._in_flight = {c.comfy_url: 0 for c in self.clients}
+
+        # Load on the server that isn't ours, sampled from /api/queue
+        self._external_load = {c.comfy_url: 0 for c in self.clients}
+        self._queue_checked_at = {c.comfy_url: 0.0 for c in self.clients}
+
+        self._cond = threading.Condition()
+
+        # Optional crash-safe record of jobs; see attach_journal()
+        self.journal: JobJournal = None
+        self._seed = random.randint(0, 2**31 - 1)
+
+        # (index, count) when this process handles one slice of the job space
+        self.shard = None
+
+        # Weighted lanes sharing the slots, and the jobs currently holding one; see the Control section
+        self.lanes = LaneScheduler(lanes)
+        self._jobs: Dict[str, dict] = {}
+
+        # Circuit breaker per server: consecutive failed jobs and failed probes are
+        # counted apart, since a hung server still answers probes; see record_failure()
+        self._failures = {c.comfy_url: 0 for c in self.clients}
+        self._probe_failures = {c.comfy_url: 0 for c in self.clients}
+        self._tripped_at = {}  # url -> when it left rotation
+        self._half_open = set()  # urls let back in for one trial job
+        if health_interval:
+            threading.Thread(target=self._health_loop, name="pool-health", daemon=True).start()
+
+    @classmethod
+    def from_config(cls, config: Config) -> "ComfyUIPool":
+        return cls(
+            servers=config.server_configs(),
+            output_folder=config.output_base_folder,
+            download_workers=config.download_workers,
+            use_websocket=config.use_websocket,
+            cache_folder=config.cache_dir(),
+            upload_inputs=config.upload_inputs,
+            result_cache_max_bytes=int(config.result_cache_max_gb * 1024**3) if config.result_cache else None,
+            affinity_window=config.affinity_window,
+            metrics=Metrics(config.metrics_dir()) if config.metrics else None,
+            job_timeout=config.job_timeout or None,
+            timeout_factor=config.timeout_factor,
+            health_interval=config.health_interval,
+            failure_threshold=config.failure_threshold,
+            breaker_cooldown=config.breaker_cooldown,
+            max_retries=config.max_retries,
+            lanes=config.lanes
+        )
+
+    def attach_journal(self, journal: JobJournal) -> None:
+        """Record jobs carrying an "id" and skip/reattach the ones the journal already knows"""
+        self.journal = journal
+
+    def set_shard(self, index: int, count: int) -> None:
+        """Only run jobs whose id hashes to shard index (1-based) of count"""
+        if not 1 <= index <= count:
+            raise ValueError(f"Shard {index}/{count} out of range")
+        self.shard = (index, count)
+
+    @property
+    def run_seed(self) -> int:
+        """Seed for any random job planning, stable across --resume"""
+        return self.journal.seed if self.journal else self._seed
+
+    def render_cost(self, workflow: Workflow, video_path: str, segment: tuple = None):
+        """(template key, frames x megapixels) of a V2V job, the cost model's inputs; None if unreadable"""
+        if video_path in self._unsized:
+            return None
+        try:
+            return self._render_cost(workflow, video_path, segment)
+        except Exception as e:
+            print(f"[Cost] ✖ Can't size {os.path.basename(video_path)}: {e}")
+            self._unsized.add(video_path)
+            return None
+
+    def _render_cost(self, workflow: Workflow, video_path: str, segment: tuple = None) -> Tuple[str, float]:
+        profile = self._profiles.get(workflow.workflow_file)
+        if profile is None:
+            template = self.template_cache.get(workflow.workflow_file)
+            profile = self._profiles[workflow.workflow_file] = template_profile(workflow.workflow_file, template)
+        key, megapixels = profile
+        if segment:
+            template = self.template_cache.get(workflow.workflow_file)
+            loader_fps = float(template[str(workflow.inputs["video"])]["inputs"].get("force_rate") or 0)
+            loader_fps = loader_fps or self.video_probe.get(video_path)["fps"]
+            frames = math.ceil(segment[1] * 16 / loader_fps)
+        else:
+            frames = self.video_probe.frame_count_at(video_path, fps=16)
+        return key, frames * megapixels
+
+    def cost_plan(self) -> CostPlan:
+        return CostPlan(self.cost_model, self.slots)
+
+    @property
+    def slots(self) -> int:
+        """Total number of jobs the pool runs at once"""
+        return sum(self._capacity.values())
+
+    # -------------------------
+    # Health
+    # -------------------------
+
+    def record_failure(self, client: ComfyUIClient, reason, probe: bool = False) -> None:
+        """
+        Count a failed job (or probe); past failure_threshold in a row the server
+        leaves rotation. A failed trial job on a half-open server trips it again at once.
+        """
+        url = client.comfy_url
+        with self._cond:
+            counts = self._probe_failures if probe else self._failures
+            counts[url] += 1
+            retrial = url in self._half_open and not probe
+            trip = retrial or (counts[url] >= self.failure_threshold and not client.down.is_set())
+            if trip:
+                self._half_open.discard(url)
+                self._tripped_at[url] = time.monotonic()
+                client.down.set()
+        if trip:
+            # Prompts still waiting on it raise ServerUnavailable and are requeued elsewhere
+            if retrial:
+                print(f"[Pool] ✖ {url} failed its trial job ({reason}); out of rotation again")
+            else:
+                print(f"[Pool] ✖ {url} taken out of rotation ({reason}); failing over its jobs")
+            if all(c.down.is_set() for c in self.clients):
+                print("[Pool] ✖ No healthy servers left; waiting for one to recover")
+            if self.metrics:
+                self.metrics.incr("server_down", server=url)
+
+    def record_success(self, client: ComfyUIClient) -> None:
+        """A job finished on the server: its breaker closes"""
+        url = client.comfy_url
+        with self._cond:
+            self._failures[url] = 0
+            self._probe_failures[url] = 0
+            recovered = url in self._half_open
+            self._half_open.discard(url)
+            self._tripped_at.pop(url, None)
+            if recovered:
+                # Its full capacity is free again
+                self._cond.notify_all()
+        if recovered:
+            print(f"[Pool] ✔ {url} finished its trial job; back in rotation")
+
+    def _probe_passed(self, client: ComfyUIClient) -> None:
+        """
+        A passing probe only says the server answers, not that it finishes prompts:
+        once the cooldown is over a tripped server goes half-open, taking one trial job
+        """
+        url = client.comfy_url
+        with self._cond:
+            self._probe_failures[url] = 0
+            half_open = (client.down.is_set()
+                         and time.monotonic() - self._tripped_at.get(url, 0.0) >= self.breaker_cooldown)
+            if half_open:
+                self._half_open.add(url)
+                client.down.clear()
+                self._cond.notify_all()
+        if half_open:
+            print(f"[Pool] ↻ {url} answers again; trying one job on it")
+            client.cancel_abandoned()
+
+    def _health_loop(self) -> None:
+        while True:
+            time.sleep(self.health_interval)
+            for client in self.clients:
+                try:
+                    client.check_health()
+                except (requests.RequestException, ValueError, ServerUnavailable) as e:
+                    self.record_failure(client, e, probe=True)
+                    continue
+                self._probe_passed(client)
+
+    def _deadline(self, client: ComfyUIClient, job: dict, cost) -> Optional[float]:
+        """
+        Seconds a job may wait for its prompt: timeout_factor x its predicted
+        render time for every prompt of ours that can sit ahead of it on the
+        server, or job_timeout when there is no prediction
+        """
+        job_cost = cost(job) if cost else None
+        predicted = self.cost_model.predict(*job_cost) if job_cost else None
+        if predicted:
+            return self.timeout_factor * predicted * self._capacity[client.comfy_url] + 60
+        return self.job_timeout
+
+    # -------------------------
+    # Server selection
+    # -------------------------
+
+    def _refresh_external_load(self, client: ComfyUIClient) -> None:
+        url = client.comfy_url
+        now = time.monotonic()
+        if client.down.is_set() or now - self._queue_checked_at[url] < self.queue_refresh_seconds:
+            return
+        self._queue_checked_at[url] = now
+        try:
+            depth = client.get_queue_depth()
+        except Exception as e:
+            print(f"[Pool] ✖ Could not read queue of {url}: {e}")
+            return
+        self._external_load[url] = max(0, depth - self._in_flight[url])
+
+    def _load(self, client: ComfyUIClient) -> int:
+        url = client.comfy_url
+        return self._in_flight[url] + self._external_load[url]
+
+    def _client_for(self, url: str):
+        return next((c for c in self.clients if c.comfy_url == url), None)
+
+    def _has_room(self, client: ComfyUIClient) -> bool:
+        url = client.comfy_url
+        # A half-open server runs its trial job alone
+        capacity = 1 if url in self._half_open else self._capacity[url]
+        return self._in_flight[url] < capacity and not client.down.is_set()
+
+    def acquire(self, only: ComfyUIClient = None, lane: str = None, exclude: set = None) -> ComfyUIClient:
+        """
+        Block until a server has a free slot and it is lane's turn, then return
+        the least loaded server (or wait for a slot on `only`, which skips the
+        turn order). Servers whose url is in exclude are used only while no
+        other server is up. Raises LaneClosed once the lane is cancelled or the pool drains.
+        """
+        # Queue probes happen outside the lock so a slow server can't stall the others
+        for client in self.clients:
+            self._refresh_external_load(client)
+
+        with self._cond:
+            self.lanes.check_open(lane)
+            self.lanes.arrive(lane)
+            try:
+                while True:
+                    self.lanes.check_open(lane)
+                    candidates = [only] if only else self.clients
+                    if exclude and not only:
+                        others = [c for c in self.clients if c.comfy_url not in exclude]
+                        if any(not c.down.is_set() for c in others):
+                            candidates = others
+                    free = [c for c in candidates if self._has_room(c)]
+                    if free and (only or self.lanes.my_turn(lane)):
+                        client = min(free, key=self._load)
+                        self._in_flight[client.comfy_url] += 1
+                        self.lanes.started(lane)
+                        return client
+                    self._cond.wait()
+            finally:
+                self.lanes.leave(lane)
+
+    def release(self, client: ComfyUIClient) -> None:
+        with self._cond:
+            self._in_flight[client.comfy_url] -= 1
+            # Every waiting lane re-checks whose turn it is
+            self._cond.notify_all()
+
+    @contextmanager
+    def lease(self):
+        client = self.acquire()
+        try:
+            yield client
+        finally:
+            self.release(client)
+
+    # -------------------------
+    # Control
+    # -------------------------
+
+    def _track(self, job: dict, lane: str, stage: str, call: object) -> dict:
+        key = job.get("id") or f"{stage}-{id(job):x}"
+        handle = {"id": key, "lane": lane or DEFAULT_LANE, "stage": stage, "server": None,
+                  "prompt_id": None, "cancel": threading.Event(), "call": call}
+        with self._cond:
+            self._jobs[key] = handle
+        return handle
+
+    def _untrack(self, handle: dict) -> None:
+        with self._cond:
+            if self._jobs.get(handle["id"]) is handle:
+                del self._jobs[handle["id"]]
+
+    def cancel_jobs(self, match: Callable[[dict], bool]) -> int:
+        """Cancel the tracked jobs match(handle) selects; their prompts are removed from the servers"""
+        with self._cond:
+            handles = [h for h in self._jobs.values() if match(h) and not h["cancel"].is_set()]
+        for handle in handles:
+            handle["cancel"].set()
+        return len(handles)
+
+    def cancel_job(self, job_id: str) -> bool:
+        return self.cancel_jobs(lambda h: h["id"] == job_id) > 0
+
+    def pause_lane(self, name: str) -> None:
+        with self._cond:
+            self.lanes.lane(name).paused = True
+
+    def resume_lane(self, name: str) -> None:
+        with self._cond:
+            lane = self.lanes.lane(name)
+            lane.paused = False
+            lane.cancelled = False
+            self._cond.notify_all()
+
+    def set_lane_weight(self, name: str, weight: float) -> None:
+        if weight <= 0:
+            raise ValueError("Lane weight must be positive")
+        with self._cond:
+            self.lanes.lane(name).weight = weight
+            self._cond.notify_all()
+
+    def cancel_lane(self, name: str) -> int:
+        """Start nothing more from the lane and cancel its jobs on the servers"""
+        with self._cond:
+            self.lanes.lane(name).cancelled = True
+            self._cond.notify_all()
+        return self.cancel_jobs(lambda h: h["lane"] == (name or DEFAULT_LANE))
+
+    def drain(self) -> None:
+        """Start no new jobs; the ones on the servers finish and every run_jobs call returns"""
+        with self._cond:
+            self.lanes.draining = True
+            self._cond.notify_all()
+        print("[Pool] Draining: no new jobs will start; waiting for the running ones")
+
+    def lane_closed(self, name: str = None, timeout: float = 0) -> bool:
+        """Whether the lane takes no new jobs (cancelled, or the pool draining), waiting up to timeout for that"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.lanes.draining or self.lanes.lane(name).cancelled, timeout=timeout)
+
+    def status(self) -> dict:
+        with self._cond:
+            lanes = self.lanes.status()
+            for handle in self._jobs.values():
+                lane = lanes.setdefault(handle["lane"], {"weight": 1.0, "paused": False, "cancelled": False,
+                                                         "waiting": 0, "started": 0})
+                lane["running"] = lane.get("running", 0) + 1
+            return {
+                "draining": self.lanes.draining,
+                "servers": [
+                    {"url": c.comfy_url, "in_flight": self._in_flight[c.comfy_url],
+                     "capacity": self._capacity[c.comfy_url], "external": self._external_load[c.comfy_url],
+                     "down": c.down.is_set(), "half_open": c.comfy_url in self._half_open}
+                    for c in self.clients
+                ],
+                "lanes": {name: {"running": 0, **lane} for name, lane in lanes.items()},
+                "jobs": [
+                    {k: v for k, v in handle.items() if k not in ("cancel", "call")}
+                    for handle in self._jobs.values()
+                ]
+            }
+
+    def transcoder_for(self, workflow: Workflow):
+        """VideoTranscoder for a V2V workflow with pretranscode set, else None"""
+        if not workflow.pretranscode:
+            return None
+        if not self.cache_folder:
+            print("[Transcode] ✖ pretranscode needs a cache folder; using source videos as-is")
+            return None
+        fps = workflow.transcode_fps
+        if fps is None:
+            # Match what the loader would resample to anyway
+            template = self.template_cache.get(workflow.workflow_file)
+            fps = float(template[str(workflow.inputs["video"])]["inputs"].get("force_rate") or 0)
+        return VideoTranscoder(
+            self.cache_folder, self.file_hashes, fps, workflow.transcode_width, workflow.transcode_height
+        )
+
+    def prefetch_inputs(self, paths: Iterable[str]) -> None:
+        """Start hashing input files in the background so uploads don't wait on it"""
+        if self.upload_inputs:
+            self.file_hashes.prefetch(paths)
+
+    # -------------------------
+    # ComfyUIClient-compatible helpers
+    # -------------------------
+
+    def generate_animate_workflow(self, *args, **kwargs):
+        with self.lease() as client:
+            return client.generate_animate_workflow(*args, **kwargs)
+
+    def generate_text2image(self, *args, **kwargs):
+        with self.lease() as client:
+            return client.generate_text2image(*args, **kwargs)
+
+    # -------------------------
+    # Batch dispatch
+    # -------------------------
+
+    def run_jobs(
+        self,
+        jobs: Iterable[dict],
+        submit: Callable[[ComfyUIClient, dict], PendingPrompt],
+        on_done: Callable[[dict, str], None],
+        on_error: Callable[[dict, Exception], None],
+        max_in_flight: int = None,
+        affinity: Callable[[dict], Tuple] = None,
+        shard: bool = True,
+        stage: str = "jobs",
+        cost: Callable[[dict], Optional[Tuple[str, float]]] = None,
+        plan: CostPlan = None,
+        lane: str = None
+    ) -> None:
+        """
+        Pipeline jobs across the pool.
+        submit(client, job) builds and queues the prompt, on_done(job, output)
+        runs once the outputs are downloaded, on_error(job, exc) on any failure.
+        Jobs are pulled from the iterable only when a slot frees up, and
+        max_in_flight caps how many of this call's jobs hold slots at once, so
+        several run_jobs calls (pipeline stages) can share the pool.
+
+        With a journal attached, jobs carrying an "id" are recorded as they go;
+        finished ones are skipped (on_done gets the recorded output) and ones
+        still known to their server are reattached via job["prompt_id"].
+
+        affinity(job) returns the job's cacheable inputs, most expensive first
+        (e.g. (video, person)). Up to affinity_window jobs are then buffered and
+        each free server takes the one sharing most with its previous prompt,
+        so ComfyUI's node cache skips re-running those branches. Only pass it
+        for iterables that never block, since the buffer reads ahead.
+
+        With a shard set (see set_shard), jobs carrying an "id" outside it are
+        dropped; pass shard=False for jobs derived from this shard's own output.
+
+        stage labels this call's job counts and timings in the metrics.
+
+        cost(job) returns the job's (key, units) for the cost model (see
+        render_cost); each rendered job's time then refines the model, and
+        with a plan of the whole call a live ETA is printed as jobs finish.
+
+        Each prompt gets a deadline (see _deadline). A job whose server stops
+        answering, leaves rotation or misses the deadline is put back on
+        another server after a backoff, up to max_retries times.
+
+        lane names the priority lane this call's jobs take server slots from
+        (see LaneScheduler). Once the lane is cancelled or the pool drains, no
+        further jobs are started and the call returns when the running ones end.
+        """
+        journal = self.journal
+        metrics = self.metrics
+        stage_slots = threading.Semaphore(max_in_flight) if max_in_flight else None
+        downloads = ThreadPoolExecutor(max_workers=self.download_workers)
+
+        def _finished(job: dict):
+            job_cost = cost(job) if plan else None
+            if job_cost:
+                # Segments of one video were planned as a single job
+                plan.finish(*job_cost, jobs=0 if job.get("segment_index") else 1)
+                plan.print_eta()
+
+        def _observe(client: ComfyUIClient, job: dict, pending: PendingPrompt, posted: float):
+            if pending.cached:
+                return
+            finished = time.monotonic()
+            with self._cond:
+                previous = self._last_finish.get(client.comfy_url, 0.0)
+                self._last_finish[client.comfy_url] = finished
+            job_cost = cost(job) if cost and posted else None
+            if job_cost:
+                # A server renders one prompt at a time; time this one from when it could start
+                self.cost_model.observe(*job_cost, finished - max(posted, previous))
+
+        def _done(job: dict, output: str, started: float):
+            if journal and job.get("id"):
+                journal.mark_done(job["id"], output)
+            if metrics:
+                metrics.observe("job", time.monotonic() - started, stage=stage)
+                metrics.incr("jobs", stage=stage, status="done")
+            _finished(job)
+            on_done(job, output)
+
+        def _error(job: dict, error: Exception):
+            if journal and job.get("id"):
+                journal.mark_failed(job["id"], str(error))
+            if metrics:
+                metrics.incr("jobs", stage=stage, status="failed")
+            _finished(job)
+            on_error(job, error)
+
+        def _fetch(job: dict, pending: PendingPrompt, result: dict, started: float):
+            try:
+                output = pending.fetch_outputs(result)
+            except Exception as e:
+                _error(job, e)
+                return
+            _done(job, output, started)
+
+        def _release(client: ComfyUIClient):
+            self.release(client)
+            if stage_slots:
+                stage_slots.release()
+
+        active = [0]  # jobs dispatched and not yet done, failed or handed to downloads
+        attempts = {}
+        failed_on = {}  # id(job) -> urls of the servers that failed it, avoided on retry
+        handles = {}  # id(job) -> the pool's control handle while the job is active
+        call = object()
+
+        def _settle(job: dict):
+            self._untrack(handles.pop(id(job)))
+            failed_on.pop(id(job), None)
+            with self._cond:
+                active[0] -= 1
+                self._cond.notify_all()
+
+        def _slot(only: ComfyUIClient = None, exclude: set = None):
+            """Stage and server slot for this call's next job, or None once its lane is closed"""
+            if stage_slots:
+                stage_slots.acquire()
+            try:
+                return self.acquire(only=only, lane=lane, exclude=exclude)
+            except LaneClosed:
+                if stage_slots:
+                    stage_slots.release()
+                raise
+
+        def _dispatch(client: ComfyUIClient, job: dict):
+            handles[id(job)] = self._track(job, lane, stage, call)
+            with self._cond:
+                active[0] += 1
+            workers.submit(_run, client, job)
+
+        def _requeue(job: dict, attempt: int):
+            # Bounded backoff, then whichever other healthy server frees up first
+            time.sleep(min(2 ** attempt, 60))
+            try:
+                client = _slot(exclude=failed_on.get(id(job)))
+            except Exception as e:
+                _error(job, e)
+                _settle(job)
+                return
+            workers.submit(_run, client, job)
+
+        def _run(client: ComfyUIClient, job: dict):
+            # Submitting here rather than in the dispatch loop keeps a slow
+            # upload or patch on one server from holding up the others
+            started = time.monotonic()
+            reattached = "prompt_id" in job
+            handle = handles[id(job)]
+            handle["server"] = client.comfy_url
+            try:
+                if handle["cancel"].is_set():
+                    raise JobCancelled("Cancelled before it was queued")
+                pending = submit(client, job)
+                handle["prompt_id"] = pending.prompt_id
+                # Reattached prompts were posted by an earlier process at an unknown time
+                posted = None if reattached else time.monotonic()
+                if journal and job.get("id"):
+                    journal.mark_queued(job["id"], client.comfy_url, pending.prompt_id)
+                result = pending.wait(timeout=self._deadline(client, job, cost), cancel=handle["cancel"])
+            except Exception as e:
+                _release(client)
+                failover = isinstance(e, (ServerUnavailable, requests.ConnectionError, requests.Timeout))
+                if failover:
+                    self.record_failure(client, e)
+                attempt = attempts.get(id(job), 0) + 1
+                if failover and attempt <= self.max_retries:
+                    attempts[id(job)] = attempt
+                    failed_on.setdefault(id(job), set()).add(client.comfy_url)
+                    job.pop("prompt_id", None)
+                    print(f"[Pool] ↻ Retrying job on another server ({attempt}/{self.max_retries}): {e}")
+                    if metrics:
+                        metrics.incr("jobs", stage=stage, status="retried")
+                    threading.Thread(target=_requeue, args=(job, attempt), name="pool-retry", daemon=True).start()
+                    return
+                attempts.pop(id(job), None)
+                _error(job, e)
+                _settle(job)
+                return
+            attempts.pop(id(job), None)
+            if not pending.cached:
+                self.record_success(client)
+            _observe(client, job, pending, posted)
+            # The server is done with it; free the slot before downloading
+            _release(client)
+            downloads.submit(_fetch, job, pending, result, started)
+            _settle(job)
+
+        def _planned():
+            # Settle journal state as jobs are pulled: finished ones are reported
+            # and dropped, ones still on their server come back pinned to it
+            for job in jobs:
+                # Jobs split from one parent (video segments) carry its id as shard_key
+                shard_key = job.get("shard_key") or job.get("id")
+                if shard and self.shard and shard_key and not in_shard(shard_key, *self.shard):
+                    continue
+
+                entry = journal.get(job["id"]) if journal and job.get("id") else None
+
+                if entry and entry["status"] == DONE and _outputs_exist(entry["output_path"]):
+                    print(f"[Journal] ↷ Already done: {entry['output_path']}")
+                    if metrics:
+                        metrics.incr("jobs", stage=stage, status="skipped")
+                    _finished(job)
+                    on_done(job, entry["output_path"])
+                    continue
+
+                only = None
+                if entry and entry["status"] == QUEUED and entry["prompt_id"]:
+                    owner = self._client_for(entry["server"])
+                    try:
+                        known = owner is not None and owner.prompt_known(entry["prompt_id"])
+                    except Exception:
+                        known = False
+                    if known:
+                        print(f"[Journal] ↺ Reattaching to {entry['prompt_id']} on {owner.comfy_url}")
+                        job["prompt_id"] = entry["prompt_id"]
+                        only = owner
+                yield job, only
+
+        picker = AffinityPicker(affinity) if affinity else None
+
+        with self._cond:
+            self.lanes.open(lane)
+        with downloads, ThreadPoolExecutor(max_workers=self.slots) as workers:
+            try:
+                try:
+                    if not picker:
+                        for job, only in _planned():
+                            _dispatch(_slot(only), job)
+                    else:
+                        buffer = []
+                        planned = _planned()
+                        exhausted = False
+                        while True:
+                            while not exhausted and len(buffer) < self.affinity_window:
+                                try:
+                                    job, only = next(planned)
+                                except StopIteration:
+                                    exhausted = True
+                                    break
+                                if only is None:
+                                    buffer.append(job)
+                                    continue
+                                _slot(only)
+                                picker.record(only.comfy_url, affinity(job))
+                                _dispatch(only, job)
+                            if not buffer:
+                                break
+                            client = _slot()
+                            _dispatch(client, picker.pick(client.comfy_url, buffer))
+                except LaneClosed as e:
+                    print(f"[Pool] {e}; no more {stage} jobs will start")
+                # Failed-over jobs come back from their own threads; wait them out
+                # before leaving the block drains the workers, then the downloads they queued
+                with self._cond:
+                    self._cond.wait_for(lambda: active[0] == 0)
+            except KeyboardInterrupt:
+                # Don't leave our prompts queued on the servers
+                cancelled = self.cancel_jobs(lambda h: h["call"] is call)
+                print(f"[Pool] Interrupted; cancelling {cancelled} {stage} prompt(s) on the servers")
+                raise
+            finally:
+                with self._cond:
+                    self.lanes.close(lane)
+
+        if picker and picker.jobs:
+            rates = " | ".join(f"{rate:.0%}" for rate in picker.hit_rates())
+            print(f"[Pool] Estimated node-cache hits per input (most expensive first): {rates}")
+
+        if cost:
+            self.cost_model.save()
+        if metrics:
+            metrics.write_prometheus()
@@ -0,0 +1,111 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import Future
+from typing import Dict
+import requests
+from utils.file_hash import FileHashCache
+from utils.json_store import load_json, save_json
+
+UPLOAD_TIMEOUT = (10, 300)  # (connect, read) seconds; the read allows for large videos on a slow link
+
+class InputUploader:
+    """
+    Uploads local input files to one ComfyUI server's input folder under
+    <subfolder>/<sha256><ext>, remembering what the server already has so a
+    file reused across many jobs is sent once per server. Names remembered
+    from earlier runs are checked with a HEAD on /api/view the first time
+    they're needed, in case the server's input folder was cleaned since.
+    """
+    def __init__(
+        self,
+        comfy_url: str,
+        hashes: FileHashCache,
+        cache_folder: str = None,
+        subfolder: str = "automated",
+        session: requests.Session = None
+    ):
+        self.comfy_url = comfy_url
+        self.http = session or requests
+        self.hashes = hashes
+        self.subfolder = subfolder
+
+        self.index_path = None
+        if cache_folder:
+            server_key = hashlib.sha1(comfy_url.encode("utf-8")).hexdigest()[:12]
+            self.index_path = os.path.join(cache_folder, f"uploads_{server_key}.json")
+
+        self._uploaded = set()  # on the server, as far as this run knows
+        self._known = set(load_json(self.index_path, [], "Upload"))  # recorded by earlier runs; verified before use
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _save(self) -> None:
+        with self._lock:
+            names = sorted(self._uploaded | self._known)
+        save_json(self.index_path, names)
+
+    def _exists(self, name: str) -> bool:
+        try:
+            response = self.http.head(
+                f"{self.comfy_url}/api/view",
+                params={"filename": name, "subfolder": self.subfolder, "type": "input"},
+                timeout=(10, 30)
+            )
+        except requests.RequestException:
+            return False
+        return response.status_code == 200
+
+    def _upload(self, local_path: str, name: str) -> None:
+        with open(local_path, "rb") as f:
+            response = self.http.post(
+                f"{self.comfy_url}/upload/image",
+                files={"image": (name, f)},
+                data={"subfolder": self.subfolder, "type": "input", "overwrite": "true"},
+                timeout=UPLOAD_TIMEOUT
+            )
+        if response.status_code != 200:
+            raise RuntimeError(f"Error uploading {local_path}: {response.text}")
+
+    def server_name(self, local_path: str) -> str:
+        """
+        Name of local_path inside the server's input folder, uploading it first
+        if this server hasn't seen that content yet.
+        """
+        digest = self.hashes.hash(local_path)
+        ext = os.path.splitext(local_path)[1].lower()
+        name = f"{digest}{ext}"
+        remote = f"{self.subfolder}/{name}"
+
+        with self._lock:
+            if remote in self._uploaded:
+                return remote
+            future = self._in_flight.get(remote)
+            owner = future is None
+            if owner:
+                future = self._in_flight[remote] = Future()
+
+        if not owner:
+            # Another job is already uploading the same content
+            future.result()
+            return remote
+
+        try:
+            uploaded = remote not in self._known or not self._exists(name)
+            if uploaded:
+                self._upload(local_path, name)
+        except Exception as e:
+            with self._lock:
+                self._in_flight.pop(remote, None)
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._uploaded.add(remote)
+            self._in_flight.pop(remote, None)
+        future.set_result(remote)
+        if not uploaded:
+            return remote
+        self._save()
+        print(f"[Upload] ✔ {os.path.basename(local_path)} → {self.comfy_url} ({remote})")
+        return remote
@@ -1,18 +1,60 @@
+import threading
+import time
 from typing import Union
-from clients.comfy_client import ComfyUIClient
+from clients.comfy_pool import ComfyUIPool
 from models.config_model import Config, Workflow
 from generators.v2v_generator import V2VGenerator
 from generators.text2image_generator import Text2ImageGenerator
 from generators.t2i_v2v_generator import T2IV2VGenerator
 
 class AutoGenerator:
-    def __init__(self, comfy_client: ComfyUIClient, config: Config):
+    def __init__(self, comfy_client: ComfyUIPool, config: Config):
         self.comfy_client = comfy_client
         self.config = config
         self.input_base_folder: str = config.input_base_folder
 
-    def run(self) -> None:
-        active_name: str = self.config.active_workflow
+        # Workflow runs started with start(), each on its own thread
+        self._runs = {}
+        self._runs_lock = threading.Lock()
+
+    def start(self, workflow_name: str = None, lane: str = None) -> str:
+        """Run a workflow in the background, sharing the pool with any other runs; returns its run id"""
+        name = workflow_name or self.config.active_workflow
+        if not any(wf.name == name for wf in self.config.workflows):
+            raise ValueError(f"Workflow '{name}' not found in config.")
+
+        with self._runs_lock:
+            run_id = f"{name}-{len(self._runs) + 1}"
+            run = self._runs[run_id] = {"workflow": name, "lane": lane, "status": "running"}
+
+        def _target():
+            try:
+                self.run(name, lane)
+                run["status"] = "finished"
+            except Exception as e:
+                run["status"] = f"failed: {e}"
+                print(f"[AutoGenerator] ✖ Run {run_id} failed: {e}")
+
+        run["thread"] = threading.Thread(target=_target, name=f"run {run_id}", daemon=True)
+        run["thread"].start()
+        print(f"[AutoGenerator] Started run {run_id}" + (f" in lane '{lane}'" if lane else ""))
+        return run_id
+
+    def runs(self) -> dict:
+        with self._runs_lock:
+            return {run_id: {k: v for k, v in run.items() if k != "thread"} for run_id, run in self._runs.items()}
+
+    def running(self) -> bool:
+        with self._runs_lock:
+            return any(run["thread"].is_alive() for run in self._runs.values())
+
+    def wait(self, serve: bool = False) -> None:
+        """Block until every started run ends; with serve, until the pool is also drained"""
+        while self.running() or (serve and not self.comfy_client.lanes.draining):
+            time.sleep(0.5)
+
+    def run(self, workflow_name: str = None, lane: str = None) -> None:
+        active_name: str = workflow_name or self.config.active_workflow
         workflow: Workflow = next(
             (wf for wf in self.config.workflows if wf.name == active_name),
             None
@@ -20,14 +62,19 @@ class AutoGenerator:
 
         if not workflow:
             raise ValueError(f"Active workflow '{active_name}' not found in config.")
+        if lane:
+            workflow = workflow.copy(update={"lane": lane})
 
         print(f"[AutoGenerator] Running workflow: {workflow.name} ({workflow.type})")
+        if self.config.watch and workflow.type != "v2v":
+            print(f"[AutoGenerator] Watch mode only applies to v2v workflows; running {workflow.name} once")
 
         if workflow.type == "v2v":
             gen = V2VGenerator(
                 comfy_client=self.comfy_client,
                 workflow_config=workflow,
-                input_base_folder=self.input_base_folder
+                input_base_folder=self.input_base_folder,
+                watch_interval=self.config.watch_interval if self.config.watch else None
             )
             gen.run()
 
@@ -46,7 +93,8 @@ class AutoGenerator:
                 comfy_client=self.comfy_client,
                 t2i_workflow=t2i_workflow,
                 v2v_workflow=v2v_workflow,
-                input_base_folder=self.input_base_folder
+                input_base_folder=self.input_base_folder,
+                pipeline_workflow=workflow
             )
             gen.run()
 
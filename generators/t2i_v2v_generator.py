@@ -1,13 +1,19 @@
 # generators/t2i_v2v_generator.py
 
 import os
+import queue
 import random
+import threading
 from datetime import datetime
-from clients.comfy_client import ComfyUIClient
+from clients.comfy_client import ComfyUIClient, PendingPrompt
+from clients.comfy_pool import ComfyUIPool
 from models.config_model import Workflow, Influencer
 from generators.text2image_generator import Text2ImageGenerator
 from generators.v2v_generator import V2VGenerator
 from utils.file_utils import list_valid, is_image, is_video
+from utils.image_dedup import ImageHashIndex, NearDuplicateFilter
+from utils.job_journal import in_shard, make_job_id
+from utils.video_segments import SegmentAssembler, render_affinity
 
 class T2IV2VGenerator:
     """
@@ -17,24 +23,87 @@ class T2IV2VGenerator:
     """
     def __init__(
         self,
-        comfy_client: ComfyUIClient,
+        comfy_client: ComfyUIPool,
         t2i_workflow: Workflow,
         v2v_workflow: Workflow,
-        input_base_folder: str
+        input_base_folder: str,
+        pipeline_workflow: Workflow = None
     ):
         self.client = comfy_client
         self.t2i_workflow = t2i_workflow
         self.v2v_workflow = v2v_workflow
+        self.pipeline_workflow = pipeline_workflow  # the t2i_then_v2v entry itself
         self.input_base_folder = input_base_folder
 
         # Output paths
         self.t2i_output_folder = os.path.join(self.client.output_folder, "t2i_generated")
         os.makedirs(self.t2i_output_folder, exist_ok=True)
 
-    def _generate_all_influencer_images(self):
+        # Optional local re-encode of source videos to the rendered fps/size
+        self.transcoder = self.client.transcoder_for(self.v2v_workflow)
+
+        # Predicted render time of the V2V stage, for the ETA
+        self.plan = self.client.cost_plan()
+
+        # Optional near-duplicate filter between the stages
+        self.dedup = None
+        threshold = self.pipeline_workflow.dedup_threshold if self.pipeline_workflow else None
+        if threshold is not None:
+            cache_folder = self.client.cache_folder
+            index = ImageHashIndex(
+                os.path.join(cache_folder, "image_hashes.json") if cache_folder else None,
+                method=self.pipeline_workflow.dedup_hash
+            )
+            self.dedup = NearDuplicateFilter(index, threshold)
+            self._seed_dedup()
+
+    def _seed_dedup(self):
+        """New images must also differ from what earlier runs generated for the influencer"""
+        for inf in self._shard_influencers():
+            folder = os.path.join(self.t2i_output_folder, inf.name)
+            earlier = list_valid(folder, is_image) if os.path.isdir(folder) else []
+            if earlier:
+                self.dedup.seed(inf.name, earlier)
+                print(f"[Dedup] {inf.name}: comparing against {len(earlier)} image(s) from earlier runs")
+
+    def _dedup_images(self, influencer_images: dict) -> dict:
+        """Drop images within dedup_threshold bits of an earlier image of the same influencer"""
+        kept = {}
+        for name, imgs in influencer_images.items():
+            kept[name] = self.dedup.filter(name, imgs)
+            if len(kept[name]) < len(imgs):
+                print(f"[Dedup] {name}: {len(imgs) - len(kept[name])} near-duplicate(s) dropped, {len(kept[name])} kept")
+        return kept
+
+    def _influencer_shard_key(self, influencer_name: str) -> str:
+        return make_job_id(self.t2i_workflow.name, influencer_name)
+
+    def _shard_influencers(self) -> list:
+        """Influencers whose images (and so V2V jobs) belong to this --shard"""
+        shard = self.client.shard
+        return [
+            inf for inf in self.t2i_workflow.influencer_configs
+            if not shard or in_shard(self._influencer_shard_key(inf.name), *shard)
+        ]
+
+    def _t2i_jobs(self, t2i_gen: Text2ImageGenerator, stop: threading.Event = None):
+        """
+        T2I jobs sharded per influencer rather than per prompt: every image of
+        an influencer lands in one shard, so the V2V jobs planned from them
+        can't be rendered again by another shard. No more are yielded once stop is set.
+        """
+        for job in t2i_gen.construct_jobs():
+            if stop is not None and stop.is_set():
+                return
+            job["shard_key"] = self._influencer_shard_key(job["influencer"].name)
+            yield job
+
+    def _generate_all_influencer_images(self, on_image=None, max_in_flight: int = None, stop: threading.Event = None):
         """
         Generate images for all influencers, poses, and outfits.
         Returns a dict: { influencer_name: [list_of_image_paths] }
+        on_image(influencer_name, path) is called as each image lands;
+        setting stop ends the stage once the running jobs finish.
         """
         print("[T2I→V2V] Starting influencer image generation...")
         t2i_gen = Text2ImageGenerator(
@@ -44,49 +113,72 @@ class T2IV2VGenerator:
 
         influencer_images = {inf.name: [] for inf in self.t2i_workflow.influencer_configs}
 
-        prompt_index = 0
-        for influencer in self.t2i_workflow.influencer_configs:
-            for pose in self.t2i_workflow.pose_styles:
-                pose_prompt = pose["prompt"]
-                for outfit in self.t2i_workflow.outfits:
-                    full_prompt_parts = [pose_prompt, outfit, influencer.keyword]
-                    full_prompt = ", ".join(p for p in full_prompt_parts if p).strip()
-
-                    output_folder = os.path.join(self.t2i_output_folder, influencer.name)
-                    os.makedirs(output_folder, exist_ok=True)
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    output_path = os.path.join(
-                        output_folder,
-                        f"{influencer.name}_{prompt_index}_{timestamp}.png"
-                    )
-                    seed = random.randint(0, 2**32 - 1)
-
-                    try:
-                        self.client.generate_text2image(
-                            workflow=self.t2i_workflow,
-                            prompt=full_prompt,
-                            loras=[influencer.lora] if influencer.lora else [],
-                            seed=seed,
-                            output_path=output_path
-                        )
-                        influencer_images[influencer.name].append(output_path)
-                        print(f"[T2I→V2V] ✔ Generated: {influencer.name} | {pose['name']} | {outfit}")
-                    except Exception as e:
-                        print(f"[T2I→V2V] ✖ ERROR generating '{full_prompt}': {e}")
-
-                    prompt_index += 1
+        def _submit(client: ComfyUIClient, job: dict) -> PendingPrompt:
+            influencer: Influencer = job["influencer"]
+            output_folder = os.path.join(self.t2i_output_folder, influencer.name)
+            os.makedirs(output_folder, exist_ok=True)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            if t2i_gen.batch_size == 1:
+                names = [f"{influencer.name}_{job['index']}_{timestamp}.png"]
+            else:
+                names = [
+                    f"{influencer.name}_{job['index']}_{variant}_{timestamp}.png"
+                    for variant in range(t2i_gen.batch_size)
+                ]
+            seed = random.randint(0, 2**32 - 1)
+
+            return client.queue_text2image_batch(
+                workflow=self.t2i_workflow,
+                prompt=job["prompt"],
+                loras=[influencer.lora] if influencer.lora else [],
+                seed=seed,
+                output_paths=[os.path.join(output_folder, name) for name in names],
+                prompt_id=job.get("prompt_id")
+            )
+
+        def _on_done(job: dict, output_paths: list):
+            influencer_images[job["influencer"].name].extend(output_paths)
+            print(f"[T2I→V2V] ✔ Generated: {job['influencer'].name} | {job['pose']} | {job['outfit']}")
+            if on_image:
+                for output_path in output_paths:
+                    on_image(job["influencer"].name, output_path)
+
+        def _on_error(job: dict, error: Exception):
+            print(f"[T2I→V2V] ✖ ERROR generating '{job['prompt']}': {error}")
+
+        self.client.run_jobs(
+            self._t2i_jobs(t2i_gen, stop), _submit, _on_done, _on_error, max_in_flight=max_in_flight, stage="t2i",
+            lane=self._lane(self.t2i_workflow)
+        )
+
+        # Parallel completion order is arbitrary; keep the lists stable
+        for imgs in influencer_images.values():
+            imgs.sort()
 
         return influencer_images
 
-    def _construct_v2v_jobs(self, influencer_images):
+    def _v2v_sources(self, rng: random.Random, jobs_per_video: int):
         videos = list_valid(self.v2v_workflow.src_video_folder, is_video)
 
         if not videos:
             raise RuntimeError("No videos found in src_video_folder")
 
-        # Shuffle videos so order is different every run
+        self.client.video_probe.ensure(videos)
+
+        # Shuffle videos so order is different every run; the seed is kept in
+        # the job journal so --resume rebuilds the same job list
         videos = videos[:]  # copy
-        random.shuffle(videos)
+        rng.shuffle(videos)
+
+        # Then longest render first, so a long clip isn't what the run ends waiting on
+        costs = {video: self.client.render_cost(self.v2v_workflow, video) for video in videos}
+        for job_cost in filter(None, costs.values()):
+            key, units = job_cost
+            self.plan.add(key, units * jobs_per_video, jobs_per_video)
+        videos.sort(key=lambda video: -(costs[video] or ("", 0.0))[1])
+
+        if self.transcoder:
+            self.transcoder.start(videos)
 
         backgrounds = []
         if self.v2v_workflow.uses_background:
@@ -94,74 +186,220 @@ class T2IV2VGenerator:
             if not backgrounds:
                 raise RuntimeError("No backgrounds found")
 
-        jobs = []
-
-        for influencer_name, imgs in influencer_images.items():
-            if not imgs:
-                continue
+        self.client.prefetch_inputs(videos + backgrounds)
+        return videos, backgrounds
 
-            # Shuffle images so selection changes per run
-            imgs = imgs[:]  # copy
-            random.shuffle(imgs)
+    def _pair_rng(self, influencer_name: str, video: str) -> random.Random:
+        """Random picks for one (influencer, video) pair, the same whatever order the images land in"""
+        return random.Random(f"{self.client.run_seed}:{influencer_name}:{video}")
 
-            for video in videos:
-                img = random.choice(imgs)  # random image per video
+    def _make_v2v_job(self, rng: random.Random, influencer_name: str, video: str, img: str, backgrounds: list) -> dict:
+        job = {
+            "id": make_job_id(self.v2v_workflow.name, influencer_name, video, img),
+            "video": video,
+            "person": img,
+            "name": influencer_name
+        }
 
-                job = {
-                    "video": video,
-                    "person": img,
-                    "name": influencer_name
-                }
-
-                if self.v2v_workflow.uses_background:
-                    job["background"] = random.choice(backgrounds)
+        if self.v2v_workflow.uses_background:
+            job["background"] = rng.choice(backgrounds)
+            job["id"] = make_job_id(job["id"], job["background"])
 
-                jobs.append(job)
+        return job
 
-        # Final shuffle so influencer order is also mixed
-        random.shuffle(jobs)
+    def _construct_v2v_jobs(self, influencer_images):
+        """Lazily yield V2V jobs; the same seed and inputs always give the same sequence"""
+        rng = random.Random(self.client.run_seed)
+        videos, backgrounds = self._v2v_sources(rng, sum(1 for imgs in influencer_images.values() if imgs))
+        self.client.prefetch_inputs(img for imgs in influencer_images.values() for img in imgs)
+
+        # Shuffle images so selection changes per run
+        shuffled = {name: rng.sample(imgs, len(imgs)) for name, imgs in influencer_images.items() if imgs}
+        names = list(shuffled)
+        rng.shuffle(names)
+
+        print(f"[T2I→V2V] Total V2V jobs: {len(videos) * len(names)}")
+        self.plan.describe("T2I→V2V")
+
+        # Video-major so jobs sharing a source video sit together for the
+        # affinity scheduler; the influencer order rotates per video so every
+        # influencer keeps progressing through the run
+        for v, video in enumerate(videos):
+            for k in range(len(names)):
+                influencer_name = names[(v + k) % len(names)]
+                img = rng.choice(shuffled[influencer_name])  # random image per video
+                yield self._make_v2v_job(rng, influencer_name, video, img, backgrounds)
+
+    def _run_streaming(self):
+        """
+        Overlap the two stages: each generated image is assigned its share of
+        the videos and those V2V jobs join the render queue immediately.
+        Image k of an influencer takes every video whose index is k modulo the
+        number of images expected, so the spread matches the batch mode.
+        Images finish in any order, so each pair's picks get their own seed.
+        """
+        rng = random.Random(self.client.run_seed)
+        influencers = self._shard_influencers()
+        videos, backgrounds = self._v2v_sources(rng, len(influencers))
+        self.plan.describe("T2I→V2V")
+        per_influencer = max(1, (
+            len(self.t2i_workflow.pose_styles or [])
+            * len(self.t2i_workflow.outfits or [])
+            * max(1, self.t2i_workflow.batch_size or 1)
+        ))
+
+        jobs = queue.Queue()
+        lock = threading.Lock()
+        images = {inf.name: [] for inf in influencers}
+        assigned = {name: set() for name in images}
+
+        def on_image(influencer_name: str, image_path: str):
+            if self.dedup and not self.dedup.keep(influencer_name, image_path):
+                print(f"[Dedup] ↷ Near-duplicate skipped: {os.path.basename(image_path)}")
+                return
+            self.client.prefetch_inputs([image_path])
+            with lock:
+                k = len(images[influencer_name])
+                images[influencer_name].append(image_path)
+                for j in range(k, len(videos), per_influencer):
+                    assigned[influencer_name].add(j)
+                    pair_rng = self._pair_rng(influencer_name, videos[j])
+                    jobs.put(self._make_v2v_job(pair_rng, influencer_name, videos[j], image_path, backgrounds))
+
+        stop = threading.Event()
+
+        def t2i_stage():
+            try:
+                self._generate_all_influencer_images(
+                    on_image=on_image,
+                    max_in_flight=self.pipeline_workflow.t2i_max_in_flight if self.pipeline_workflow else None,
+                    stop=stop
+                )
+            finally:
+                # Videos whose image never arrived (failed T2I jobs) fall back to a random finished image
+                with lock:
+                    for name, imgs in images.items():
+                        if not imgs:
+                            continue
+                        for j, video in enumerate(videos):
+                            if j not in assigned[name]:
+                                pair_rng = self._pair_rng(name, video)
+                                img = pair_rng.choice(sorted(imgs))
+                                jobs.put(self._make_v2v_job(pair_rng, name, video, img, backgrounds))
+                jobs.put(None)
+
+        # No affinity here: the queue blocks until T2I delivers, so the pool
+        # can't read ahead. Jobs already arrive grouped by person image.
+        producer = threading.Thread(target=t2i_stage, name="t2i-stage")
+        producer.start()
+        segments = self._segments()
+        try:
+            self.client.run_jobs(
+                segments.expand(iter(jobs.get, None)),
+                self._submit_v2v_job,
+                segments.done,
+                segments.error,
+                max_in_flight=self.pipeline_workflow.v2v_max_in_flight if self.pipeline_workflow else None,
+                shard=False,  # T2I was sharded by influencer, so these images are this shard's alone
+                stage="v2v",
+                cost=self._v2v_job_cost,
+                plan=self.plan,
+                lane=self._lane(self.v2v_workflow)
+            )
+        finally:
+            # Normally T2I is long done; if V2V failed, don't start more images nobody will use
+            stop.set()
+            producer.join()
+
+    def _v2v_output_subfolder(self, job: dict) -> str:
+        return os.path.join("t2i_v2v", job["name"])
+
+    def _segments(self) -> SegmentAssembler:
+        """Long videos render as parallel segments, stitched before _on_v2v_done sees them"""
+        return SegmentAssembler(
+            self.client, self.v2v_workflow, self._v2v_output_subfolder, self._on_v2v_done, self._on_v2v_error
+        )
 
-        print(f"[T2I→V2V] Total V2V jobs: {len(jobs)}")
-        return jobs
+    def _lane(self, stage_workflow: Workflow) -> str:
+        """A lane set on the pipeline entry covers both stages"""
+        if self.pipeline_workflow and self.pipeline_workflow.lane:
+            return self.pipeline_workflow.lane
+        return stage_workflow.lane
+
+    def _v2v_job_cost(self, job: dict):
+        return self.client.render_cost(self.v2v_workflow, job["video"], job.get("segment"))
+
+    def _submit_v2v_job(self, client: ComfyUIClient, job: dict) -> PendingPrompt:
+        output_subfolder = self._v2v_output_subfolder(job)
+        if "segment" in job:
+            output_subfolder = os.path.join(output_subfolder, ".segments")
+        os.makedirs(os.path.join(self.client.output_folder, output_subfolder), exist_ok=True)
+
+        inputs = {
+            "video": self.transcoder.path_for(job["video"]) if self.transcoder else job["video"],
+            "person": job["person"]
+        }
+
+        if "background" in job:
+            inputs["background"] = job["background"]
+
+        lines = [
+            f"\n[T2I→V2V] Starting job on {client.comfy_url}:",
+            f"       Influencer: {job['name']}",
+            f"       Video: {os.path.basename(job['video'])}",
+        ]
+        if "background" in job:
+            lines.append(f"       Background: {os.path.basename(job['background'])}")
+        lines.append(f"       Person Image: {os.path.basename(job['person'])}")
+        if "segment" in job:
+            lines.append(f"       Segment: {job['segment_index']} (frames {job['segment'][0]}+{job['segment'][1]})")
+        print("\n".join(lines))
+
+        return client.queue_animate_workflow(
+            workflow=self.v2v_workflow,
+            inputs=inputs,
+            output_subfolder=output_subfolder,
+            prompt_id=job.get("prompt_id"),
+            segment=job.get("segment")
+        )
 
+    def _on_v2v_done(self, job: dict, output_file: str):
+        print(f"[T2I→V2V] ✔ {output_file}")
 
+    def _on_v2v_error(self, job: dict, error: Exception):
+        print(f"[T2I→V2V] ✖ ERROR ({job['name']}): {error}")
 
     def run(self):
         print("[T2I→V2V] Starting full workflow...")
+        try:
+            self._run()
+        finally:
+            if self.transcoder:
+                self.transcoder.close()
+
+    def _run(self):
+        if self.pipeline_workflow and self.pipeline_workflow.streaming:
+            self._run_streaming()
+            return
 
         # Step 1: Generate all influencer images
         influencer_images = self._generate_all_influencer_images()
+        if self.dedup:
+            influencer_images = self._dedup_images(influencer_images)
 
         # Step 2: Construct V2V jobs
         jobs = self._construct_v2v_jobs(influencer_images)
 
-        for job in jobs:
-            try:
-                output_subfolder = os.path.join("t2i_v2v", job["name"])
-                os.makedirs(os.path.join(self.client.output_folder, output_subfolder), exist_ok=True)
-
-                inputs = {
-                    "video": job["video"],
-                    "person": job["person"]
-                }
-
-                if "background" in job:
-                    inputs["background"] = job["background"]
-
-                print(f"\n[T2I→V2V] Starting job:")
-                print(f"       Influencer: {job['name']}")
-                print(f"       Video: {os.path.basename(job['video'])}")
-                if "background" in job:
-                    print(f"       Background: {os.path.basename(job['background'])}")
-                print(f"       Person Image: {os.path.basename(job['person'])}")
-
-                output_file = self.client.generate_animate_workflow(
-                    workflow=self.v2v_workflow,
-                    inputs=inputs,
-                    output_subfolder=output_subfolder
-                )
-
-                print(f"[T2I→V2V] ✔ {output_file}")
-
-            except Exception as e:
-                print(f"[T2I→V2V] ✖ ERROR ({job['name']}): {e}")
+        segments = self._segments()
+        self.client.run_jobs(
+            segments.expand(jobs),
+            self._submit_v2v_job,
+            segments.done,
+            segments.error,
+            affinity=render_affinity,
+            shard=False,  # T2I was sharded by influencer, so these images are this shard's alone
+            stage="v2v",
+            cost=self._v2v_job_cost,
+            plan=self.plan,
+            lane=self._lane(self.v2v_workflow)
+        )
@@ -1,11 +1,13 @@
 import os
 import random
 from datetime import datetime
-from clients.comfy_client import ComfyUIClient
+from clients.comfy_client import ComfyUIClient, PendingPrompt
+from clients.comfy_pool import ComfyUIPool
 from models.config_model import Workflow, Influencer
+from utils.job_journal import make_job_id
 
 class Text2ImageGenerator:
-    def __init__(self, comfy_client: ComfyUIClient, workflow_config: Workflow):
+    def __init__(self, comfy_client: ComfyUIPool, workflow_config: Workflow):
         self.client = comfy_client
         self.workflow: Workflow = workflow_config
 
@@ -14,6 +16,7 @@ class Text2ImageGenerator:
         self.model_node_id = self.workflow.model_node_id
         self.lora_node_id = self.workflow.lora_node_id
         self.seed_node_id = self.workflow.seed_node_id
+        self.batch_size = max(1, self.workflow.batch_size or 1)
 
         self.model = self.workflow.model
         self.output_pattern = self.workflow.output_filename_pattern
@@ -26,20 +29,20 @@ class Text2ImageGenerator:
 
 
 
-    def _make_output_path(self, influencer_name: str, prompt_index: int) -> str:
+    def _make_output_path(self, influencer_name: str, prompt_index: int, variant: int = None) -> str:
         folder = os.path.join(self.client.output_folder, influencer_name)
         os.makedirs(folder, exist_ok=True)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = self.output_pattern.format(prefix=f"{influencer_name}_{prompt_index}", timestamp=timestamp)
+        prefix = f"{influencer_name}_{prompt_index}" if variant is None else f"{influencer_name}_{prompt_index}_{variant}"
+        filename = self.output_pattern.format(prefix=prefix, timestamp=timestamp)
         return os.path.join(folder, filename)
 
-    def run(self):
-        print(f"[T2I] Starting full influencer-pose-outfit generation...")
-
+    def construct_jobs(self):
         prompt_index = 0
 
-        # Loop through all combinations
-        for influencer in self.influencers:
+        # Loop through all combinations, grouped by LoRA so a server swaps
+        # the influencer LoRA once per group instead of once per image
+        for influencer in sorted(self.influencers, key=lambda inf: inf.lora or ""):
             for pose in self.pose_styles:
                 pose_prompt = pose["prompt"]
 
@@ -49,22 +52,47 @@ class Text2ImageGenerator:
                         outfit,
                         influencer.keyword
                     ]
-                    full_prompt = ", ".join(p for p in full_prompt_parts if p).strip()
-                    output_path = self._make_output_path(influencer.name, prompt_index)
-                    seed = random.randint(0, 2**32 - 1)
-
-                    try:
-                        self.client.generate_text2image(
-                            workflow=self.workflow,
-                            prompt=full_prompt,
-                            loras=[influencer.lora] if influencer.lora else [],
-                            seed=seed,
-                            output_path=output_path
-                        )
-
-                        print(f"[T2I] ✔ Generated: {influencer.name} | {pose['name']} | {outfit}")
+                    yield {
+                        "id": make_job_id(self.workflow.name, influencer.name, pose["name"], outfit, prompt_index),
+                        "influencer": influencer,
+                        "pose": pose["name"],
+                        "outfit": outfit,
+                        "prompt": ", ".join(p for p in full_prompt_parts if p).strip(),
+                        "index": prompt_index
+                    }
+                    prompt_index += 1
 
-                    except Exception as e:
-                        print(f"[T2I] ✖ ERROR generating '{full_prompt}': {e}")
+    def _submit_job(self, client: ComfyUIClient, job: dict) -> PendingPrompt:
+        influencer: Influencer = job["influencer"]
+        if self.batch_size == 1:
+            output_paths = [self._make_output_path(influencer.name, job["index"])]
+        else:
+            output_paths = [
+                self._make_output_path(influencer.name, job["index"], variant)
+                for variant in range(self.batch_size)
+            ]
+        seed = random.randint(0, 2**32 - 1)
+
+        return client.queue_text2image_batch(
+            workflow=self.workflow,
+            prompt=job["prompt"],
+            loras=[influencer.lora] if influencer.lora else [],
+            seed=seed,
+            output_paths=output_paths,
+            prompt_id=job.get("prompt_id")
+        )
+
+    def _on_done(self, job: dict, output_paths: list):
+        print(
+            f"[T2I] ✔ Generated: {job['influencer'].name} | {job['pose']} | {job['outfit']}"
+            + (f" ({len(output_paths)} images)" if len(output_paths) > 1 else "")
+        )
+
+    def _on_error(self, job: dict, error: Exception):
+        print(f"[T2I] ✖ ERROR generating '{job['prompt']}': {error}")
 
-                    prompt_index += 1
+    def run(self):
+        print(f"[T2I] Starting full influencer-pose-outfit generation...")
+        self.client.run_jobs(
+            self.construct_jobs(), self._submit_job, self._on_done, self._on_error, stage="t2i", lane=self.workflow.lane
+        )
@@ -1,72 +1,221 @@
 import os
+from clients.comfy_client import ComfyUIClient, PendingPrompt
+from clients.comfy_pool import ComfyUIPool
+from utils.dir_watch import FolderWatcher
 from utils.file_utils import is_image, is_video, list_valid
+from utils.job_journal import make_job_id
+from utils.video_segments import SegmentAssembler, render_affinity
 from models.config_model import Workflow
 
 class V2VGenerator:
-    def __init__(self, comfy_client, workflow_config: Workflow, input_base_folder: str):
+    def __init__(
+        self,
+        comfy_client: ComfyUIPool,
+        workflow_config: Workflow,
+        input_base_folder: str,
+        watch_interval: float = None
+    ):
         self.client = comfy_client
         self.workflow: Workflow = workflow_config
         self.input_base_folder = input_base_folder
+        self.watch_interval = watch_interval  # keep scanning the input folders this often (seconds)
 
         # Paths
         self.output_base_folder = self.client.output_folder
 
-    def construct_jobs(self):
-        videos = list_valid(self.workflow.src_video_folder, is_video)
-        backgrounds = list_valid(self.workflow.background_folder, is_image)
-        influencer_images = {}
+        # Optional local re-encode of source videos to the rendered fps/size
+        self.transcoder = self.client.transcoder_for(self.workflow)
 
-        # Preload all influencer images
-        for influencer_name in self.workflow.influencers:
-            influencer_dir = os.path.join(self.input_base_folder, influencer_name)
-            if os.path.isdir(influencer_dir):
-                influencer_images[influencer_name] = list_valid(influencer_dir, is_image)
-            else:
-                influencer_images[influencer_name] = []
+        # Predicted render time of everything planned, for the ETA
+        self.plan = self.client.cost_plan()
 
+    def _job_cost(self, job: dict):
+        return self.client.render_cost(self.workflow, job["video"], job.get("segment"))
+
+    def _plan_videos(self, videos: list, jobs_per_video: int) -> list:
+        """videos ordered longest render first (ties keep their order), each added to the plan"""
+        self.client.video_probe.ensure(videos)
+        costs = {video: self.client.render_cost(self.workflow, video) for video in videos}
+        if jobs_per_video:
+            for job_cost in filter(None, costs.values()):
+                key, units = job_cost
+                self.plan.add(key, units * jobs_per_video, jobs_per_video)
+        # Starting the longest first keeps a long clip from being the one left running at the end
+        return sorted(videos, key=lambda video: -(costs[video] or ("", 0.0))[1])
+
+    def _prepare_inputs(self, videos: list, backgrounds: list, images: list) -> None:
+        if self.transcoder:
+            self.transcoder.start(videos)
+        # Hash inputs in the background while the first jobs are dispatched
+        self.client.prefetch_inputs(videos + backgrounds + images)
+
+    def _jobs_for(self, videos: list, backgrounds: list, influencer_images: dict, revisions: dict = None):
+        """
+        Every (video, background, image) job over the given inputs in a fixed
+        order. revisions maps inputs that changed on disk to their mtime so the
+        re-render gets a new job id rather than the journal's finished one.
+        """
+        revisions = revisions or {}
+        max_images = max((len(imgs) for imgs in influencer_images.values()), default=0)
         for video in videos:
             for background in backgrounds:
                 # Interleave influencers
-                max_images = max(len(imgs) for imgs in influencer_images.values())
                 for i in range(max_images):
                     for influencer_name, imgs in influencer_images.items():
                         if i < len(imgs):
+                            inputs = (video, background, imgs[i])
                             yield {
+                                "id": make_job_id(
+                                    self.workflow.name, *inputs, *(revisions[p] for p in inputs if p in revisions)
+                                ),
                                 "video": video,
                                 "background": background,
                                 "person": imgs[i],
                                 "name": influencer_name
                             }
 
+    def construct_jobs(self):
+        videos = list_valid(self.workflow.src_video_folder, is_video)
+        backgrounds = list_valid(self.workflow.background_folder, is_image)
+        influencer_images = {}
+
+        # Preload all influencer images
+        for influencer_name in self.workflow.influencers:
+            influencer_dir = os.path.join(self.input_base_folder, influencer_name)
+            if os.path.isdir(influencer_dir):
+                influencer_images[influencer_name] = list_valid(influencer_dir, is_image)
+            else:
+                influencer_images[influencer_name] = []
+
+        images = [img for imgs in influencer_images.values() for img in imgs]
+        videos = self._plan_videos(videos, len(backgrounds) * len(images))
+        self._prepare_inputs(videos, backgrounds, images)
+
+        total = len(videos) * len(backgrounds) * len(images)
+        print(f"[V2V] Jobs planned: {total}")
+        self.plan.describe("V2V")
+
+        # Jobs are produced one at a time in a fixed order (sorted inputs), so
+        # a large job space never sits in memory and every shard sees the same order
+        yield from self._jobs_for(videos, backgrounds, influencer_images)
+
+    def watch_jobs(self):
+        """
+        The jobs construct_jobs would plan, then, every watch_interval seconds,
+        jobs for input files that appeared or changed since: a new video is
+        paired with every background and image, a new image with every video
+        and background, and so on. Runs until Ctrl+C, or until the pool drains
+        or the workflow's lane is cancelled.
+        """
+        video_watch = FolderWatcher(self.workflow.src_video_folder, is_video)
+        background_watch = FolderWatcher(self.workflow.background_folder, is_image)
+        image_watches = {
+            name: FolderWatcher(os.path.join(self.input_base_folder, name), is_image)
+            for name in self.workflow.influencers
+        }
+
+        videos = video_watch.files()
+        backgrounds = background_watch.files()
+        influencer_images = {name: watch.files() for name, watch in image_watches.items()}
+        images = [img for imgs in influencer_images.values() for img in imgs]
+        videos = self._plan_videos(videos, len(backgrounds) * len(images))
+        self._prepare_inputs(videos, backgrounds, images)
+
+        print(f"[V2V] Jobs planned: {len(videos) * len(backgrounds) * len(images)}")
+        self.plan.describe("V2V")
+        yield from self._jobs_for(videos, backgrounds, influencer_images)
+
+        print(f"[V2V] Watching input folders every {self.watch_interval:g}s (Ctrl+C to stop)")
+        # Woken early by drain() / cancel_lane(); the dispatcher only notices those when a job is yielded
+        while not self.client.lane_closed(self.workflow.lane, timeout=self.watch_interval):
+            seen = set(videos) | set(backgrounds) | {img for imgs in influencer_images.values() for img in imgs}
+
+            new_videos = video_watch.poll()
+            new_backgrounds = background_watch.poll()
+            new_images = {name: watch.poll() for name, watch in image_watches.items()}
+            changed = new_videos + new_backgrounds + [img for imgs in new_images.values() for img in imgs]
+            if not changed:
+                continue
+
+            videos = video_watch.files()
+            backgrounds = background_watch.files()
+            influencer_images = {name: watch.files() for name, watch in image_watches.items()}
+            revisions = {p: os.stat(p).st_mtime_ns for p in changed if p in seen and os.path.exists(p)}
+            image_count = sum(len(imgs) for imgs in influencer_images.values())
+            new_image_count = sum(len(imgs) for imgs in new_images.values())
+            print(f"[V2V] ✚ {len(changed)} new or changed input(s): {', '.join(os.path.basename(p) for p in changed[:5])}"
+                  + (" ..." if len(changed) > 5 else ""))
+
+            # Each job whose inputs include a new file, exactly once
+            old_videos = [v for v in videos if v not in set(new_videos)]
+            old_backgrounds = [b for b in backgrounds if b not in set(new_backgrounds)]
+            new_videos = self._plan_videos(new_videos, len(backgrounds) * image_count)
+            self._prepare_inputs(new_videos, new_backgrounds, [img for imgs in new_images.values() for img in imgs])
+            yield from self._jobs_for(new_videos, backgrounds, influencer_images, revisions)
+            yield from self._jobs_for(
+                self._plan_videos(old_videos, len(new_backgrounds) * image_count),
+                new_backgrounds, influencer_images, revisions
+            )
+            yield from self._jobs_for(
+                self._plan_videos(old_videos, len(old_backgrounds) * new_image_count),
+                old_backgrounds, new_images, revisions
+            )
+            self.plan.describe("V2V")
+        print("[V2V] Stopped watching input folders")
+
+    def _output_subfolder(self, job: dict) -> str:
+        return os.path.join("v2v", job["name"])
+
+    def _submit_job(self, client: ComfyUIClient, job: dict) -> PendingPrompt:
+        output_subfolder = self._output_subfolder(job)
+        if "segment" in job:
+            output_subfolder = os.path.join(output_subfolder, ".segments")
+        os.makedirs(os.path.join(self.output_base_folder, output_subfolder), exist_ok=True)
+
+        inputs = {
+            "video": self.transcoder.path_for(job["video"]) if self.transcoder else job["video"],
+            "background": job["background"],
+            "person": job["person"]
+        }
+
+        print(
+            f"\n[V2V] Starting job on {client.comfy_url}:\n"
+            f"       Influencer: {job['name']}\n"
+            f"       Video: {os.path.basename(job['video'])}\n"
+            f"       Background: {os.path.basename(job['background'])}\n"
+            f"       Person Image: {os.path.basename(job['person'])}"
+            + (f"\n       Segment: {job['segment_index']} (frames {job['segment'][0]}+{job['segment'][1]})" if "segment" in job else "")
+        )
+
+        return client.queue_animate_workflow(
+            workflow=self.workflow,
+            inputs=inputs,
+            output_subfolder=output_subfolder,
+            prompt_id=job.get("prompt_id"),
+            segment=job.get("segment")
+        )
+
+    def _on_done(self, job: dict, output_file: str):
+        print(f"[V2V] ✔ {output_file}")
+
+    def _on_error(self, job: dict, error: Exception):
+        print(f"[V2V] ✖ ERROR ({job['name']}): {error}")
+
     def run_batch(self):
-        jobs = list(self.construct_jobs())
-        print(f"[V2V] Jobs found: {len(jobs)}")
-        for job in jobs:
-            try:
-                output_subfolder = os.path.join("v2v", job["name"])
-                os.makedirs(os.path.join(self.output_base_folder, output_subfolder), exist_ok=True)
-
-                inputs = {
-                    "video": job["video"],
-                    "background": job["background"],
-                    "person": job["person"]
-                }
-
-                print(f"\n[V2V] Starting job:")
-                print(f"       Influencer: {job['name']}")
-                print(f"       Video: {os.path.basename(job['video'])}")
-                print(f"       Background: {os.path.basename(job['background'])}")
-                print(f"       Person Image: {os.path.basename(job['person'])}")
-
-                output_file = self.client.generate_animate_workflow(
-                    workflow=self.workflow,
-                    inputs=inputs,
-                    output_subfolder=output_subfolder
-                )
-
-                print(f"[V2V] ✔ {output_file}")
-            except Exception as e:
-                print(f"[V2V] ✖ ERROR ({job['name']}): {e}")
+        # Long videos render as parallel segments, stitched before _on_done sees them
+        segments = SegmentAssembler(self.client, self.workflow, self._output_subfolder, self._on_done, self._on_error)
+        watch = self.watch_interval is not None
+        self.client.run_jobs(
+            segments.expand(self.watch_jobs() if watch else self.construct_jobs()),
+            self._submit_job,
+            segments.done,
+            segments.error,
+            affinity=None if watch else render_affinity,  # the watch loop blocks between scans
+            stage="v2v",
+            cost=self._job_cost,
+            plan=self.plan,
+            lane=self.workflow.lane
+        )
 
     def run(self):
         print("[V2VGenerator] Starting V2V batch...")
@@ -74,3 +223,6 @@ class V2VGenerator:
             self.run_batch()
         except KeyboardInterrupt:
             print("[V2VGenerator] Interrupted by user")
+        finally:
+            if self.transcoder:
+                self.transcoder.close()
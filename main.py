@@ -1,7 +1,12 @@
+import argparse
 import json
-from clients.comfy_client import ComfyUIClient
+import os
+import time
+from clients.comfy_pool import ComfyUIPool
 from generators.auto_generator import AutoGenerator
 from models.config_model import Config
+from utils.control_server import ControlServer
+from utils.job_journal import JobJournal
 
 
 def load_config() -> Config:
@@ -10,15 +15,72 @@ def load_config() -> Config:
     return Config.from_dict(raw_config)
 
 
+def parse_shard(value: str):
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got '{value}'")
+    if not 1 <= index <= count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 1 and {count}")
+    return index, count
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Automated ComfyUI Wan Animate runner")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the last run: skip finished jobs and reattach to prompts still on the server"
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Render everything even if an identical prompt graph was rendered before"
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        metavar="i/N",
+        help="Run only shard i of N (1-based); N processes with 1/N..N/N cover every job exactly once"
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and queue jobs for new or changed input files (v2v workflows)"
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Keep taking workflows from the control endpoint after the active one ends, until POST /drain"
+    )
+    args = parser.parse_args()
+    return parser, args
+
+
 if __name__ == "__main__":
+    parser, args = parse_args()
+
     # Load and validate config
     config: Config = load_config()
+    if args.serve and not config.control_port:
+        parser.error("--serve needs control_port set in config.json")
+    if args.no_cache:
+        config.result_cache = False
+    if args.watch:
+        config.watch = True
 
-    # Initialize ComfyUI client
-    comfy_client = ComfyUIClient(
-        comfy_url=config.comfyui_url,
-        output_folder=config.output_base_folder
-    )
+    # Initialize ComfyUI server pool (a single comfyui_url is a pool of one)
+    comfy_client = ComfyUIPool.from_config(config)
+
+    journal_name = "jobs.sqlite"
+    if args.shard:
+        comfy_client.set_shard(*args.shard)
+        journal_name = "jobs.shard-{}-of-{}.sqlite".format(*args.shard)
+        print("[Main] Running shard {}/{}".format(*args.shard))
+
+    # Job journal lives next to the outputs so a restart can pick up where it stopped
+    journal = JobJournal(os.path.join(config.output_base_folder, journal_name), resume=args.resume)
+    comfy_client.attach_journal(journal)
 
     # Initialize AutoGenerator with typed config
     auto_gen = AutoGenerator(
@@ -26,8 +88,29 @@ if __name__ == "__main__":
         config=config
     )
 
+    # Local control endpoint: enqueue workflows into lanes, pause, cancel, drain
+    control = ControlServer(comfy_client, auto_gen, config.control_port).start() if config.control_port else None
+
     # Run the active workflow
     try:
-        auto_gen.run()
+        if control:
+            auto_gen.start()
+            auto_gen.wait(serve=args.serve)
+        else:
+            auto_gen.run()
+    except KeyboardInterrupt:
+        # Runs on other threads don't see the interrupt; take their prompts off the servers too
+        comfy_client.drain()
+        cancelled = comfy_client.cancel_jobs(lambda job: True)
+        print(f"[Main] Interrupted; cancelling {cancelled} prompt(s) on the servers")
+        for _ in range(60):
+            if not auto_gen.running():
+                break
+            time.sleep(0.5)
     finally:
+        if control:
+            control.stop()
+        journal.close()
+        if comfy_client.metrics:
+            comfy_client.metrics.report()
         print("[Main] Shutdown complete.")
@@ -1,3 +1,4 @@
+import os
 from typing import List, Dict
 from pydantic import BaseModel, validator
 
@@ -10,6 +11,7 @@ class Workflow(BaseModel):
     name: str
     type: str  # "v2v" or "t2i"
     workflow_file: str = None
+    lane: str = None  # priority lane its jobs take server slots from ("default")
 
     # V2V-specific
     inputs: Dict[str, int] = None
@@ -18,6 +20,12 @@ class Workflow(BaseModel):
     uses_background: bool = True
     background_folder: str = None
     influencers: List[str] = None
+    segment_frames: int = None  # split longer videos into segments of this many loader frames
+    segment_overlap: int = 16  # loader frames shared by neighbouring segments, crossfaded when stitching
+    pretranscode: bool = False  # re-encode source videos locally to the rendered fps/size before queueing
+    transcode_fps: float = None  # defaults to the video loader's force_rate (0 keeps the source rate)
+    transcode_width: int = 720  # transcoded videos fit inside this box, never upscaled
+    transcode_height: int = 1280
 
     # T2I-specific
     model_node_id: int = None
@@ -25,6 +33,8 @@ class Workflow(BaseModel):
     negative_prompt_node_id: int = None
     lora_node_id: int = None
     seed_node_id: int = None
+    latent_node_id: int = None  # EmptyLatentImage whose batch_size drives batched T2I
+    batch_size: int = 1  # variants rendered per prompt in one submission
     model: str = None
     output_filename_pattern: str = None
     pose_styles: List[dict] = None
@@ -34,6 +44,27 @@ class Workflow(BaseModel):
      # For t2i_then_v2v workflow
     t2i_workflow: str = None
     v2v_workflow: str = None
+    streaming: bool = False  # start animating each image as soon as it is generated
+    t2i_max_in_flight: int = None  # per-stage caps on jobs holding server slots
+    v2v_max_in_flight: int = None
+    dedup_threshold: int = None  # skip T2I images within this many hash bits of one already kept, this run or earlier (0-64)
+    dedup_hash: str = "dhash"  # "dhash" (gradients; cheapest) or "phash" (DCT; steadier under noise, blur and recompression)
+
+    @validator("dedup_hash")
+    def check_dedup_hash(cls, v):
+        if v not in ("dhash", "phash"):
+            raise ValueError(f"dedup_hash must be 'dhash' or 'phash', not '{v}'")
+        return v
+
+    @validator("segment_overlap", always=True)
+    def check_segment_overlap(cls, v, values):
+        # Otherwise each segment starts at most one frame after the previous one
+        segment_frames = values.get("segment_frames")
+        if segment_frames is not None and not 0 <= v < segment_frames:
+            raise ValueError(
+                f"segment_overlap ({v}) must be at least 0 and smaller than segment_frames ({segment_frames})"
+            )
+        return v
 
     # -------------------------
     # Helpers for ComfyUIClient
@@ -55,16 +86,53 @@ class Workflow(BaseModel):
             "prompt": self.prompt_node_id,
             "negative": self.negative_prompt_node_id,
             "seed": self.seed_node_id,
-            "lora": self.lora_node_id
+            "lora": self.lora_node_id,
+            "latent": self.latent_node_id
         }
 
+class ComfyServer(BaseModel):
+    url: str
+    max_jobs: int = 1  # jobs we keep in flight on this server at once
+    queue_ahead: int = None  # extra prompts kept queued behind the running ones; defaults to Config.queue_ahead
+    input_dir: str = None  # server's ComfyUI input folder, needed for path-style loaders when uploading
+    output_dir: str = None  # server's ComfyUI output folder as mounted here; outputs are linked instead of downloaded
+    move_outputs: bool = False  # with output_dir, move outputs out of the server's folder rather than linking them
+
 class Config(BaseModel):
-    comfyui_url: str
+    comfyui_url: str = None
+    comfyui_servers: List[ComfyServer] = None
+    queue_ahead: int = 0
+    download_workers: int = 4
+    use_websocket: bool = True  # completion events over /ws, history polling as fallback
+    upload_inputs: bool = False  # upload inputs by content hash instead of sharing the filesystem
+    result_cache: bool = True  # reuse outputs of identical prompt graphs instead of re-rendering
+    result_cache_max_gb: float = 100.0
+    affinity_window: int = 64  # jobs buffered so each server can pick one sharing its previous inputs
+    job_timeout: float = 7200  # seconds a prompt may take when no render time can be predicted (0 = no limit)
+    timeout_factor: float = 3.0  # otherwise its deadline is this multiple of the prediction per prompt ahead of it
+    health_interval: float = 15.0  # seconds between /system_stats + /api/queue probes of every server (0 = off)
+    failure_threshold: int = 3  # failed probes or jobs in a row before a server leaves rotation
+    breaker_cooldown: float = 60.0  # seconds before a server out of rotation gets one trial job again
+    max_retries: int = 3  # times a job is moved to another server after its server fails it
+    lanes: Dict[str, float] = None  # lane name -> weight; slots are shared between busy lanes in this ratio
+    control_port: int = None  # serve the local control endpoint on 127.0.0.1:<port>
     input_base_folder: str
     output_base_folder: str
+    cache_folder: str = None  # defaults to <output_base_folder>/.cache
+    metrics: bool = True  # JSON-lines timings, a Prometheus text file and an end-of-run summary
+    metrics_folder: str = None  # defaults to <output_base_folder>/metrics
+    watch: bool = False  # keep running and queue jobs for input files that appear later
+    watch_interval: float = 10.0  # seconds between scans of the input folders in watch mode
     active_workflow: str
     workflows: List[Workflow]
 
+    @validator("comfyui_servers", pre=True)
+    def parse_servers(cls, v):
+        # Plain URL strings are accepted as shorthand for {"url": ...}
+        if v is None:
+            return v
+        return [{"url": s} if isinstance(s, str) else s for s in v]
+
     @validator("workflows", pre=True)
     def parse_influencers(cls, v):
         for wf in v:
@@ -72,6 +140,25 @@ class Config(BaseModel):
                 wf["influencer_configs"] = [Influencer(**i) for i in wf.pop("influencers")]
         return v
 
+    def server_configs(self) -> List[ComfyServer]:
+        """Return every ComfyUI endpoint, falling back to the single comfyui_url"""
+        if self.comfyui_servers:
+            servers = self.comfyui_servers
+        elif self.comfyui_url:
+            servers = [ComfyServer(url=self.comfyui_url)]
+        else:
+            raise ValueError("Config needs either comfyui_url or comfyui_servers")
+        return [
+            s if s.queue_ahead is not None else s.copy(update={"queue_ahead": self.queue_ahead})
+            for s in servers
+        ]
+
+    def cache_dir(self) -> str:
+        return self.cache_folder or os.path.join(self.output_base_folder, ".cache")
+
+    def metrics_dir(self) -> str:
+        return self.metrics_folder or os.path.join(self.output_base_folder, "metrics")
+
     @classmethod
     def from_dict(cls, data: dict):
         return cls(**data)
@@ -0,0 +1,58 @@
+import time
+import pytest
+from benchmarks.fake_comfy_server import FakeComfyServer
+from clients.comfy_client import ComfyUIClient, PendingPrompt
+
+PROMPT = {"1": {"class_type": "SaveImage", "inputs": {}}}
+
+@pytest.fixture
+def server():
+    server = FakeComfyServer(latency=0.05, output_bytes=16).start()
+    yield server
+    server.stop()
+
+def _client(server, tmp_path):
+    client = ComfyUIClient(server.url, str(tmp_path))
+    assert client.events.start(), "listener should connect to the fake /ws"
+    return client
+
+def test_completions_arrive_over_ws(server, tmp_path):
+    client = _client(server, tmp_path)
+    start = time.monotonic()
+    pending = [PendingPrompt(client, client._post_workflow(PROMPT), lambda r: r) for _ in range(5)]
+    results = [p.wait(timeout=30) for p in pending]
+
+    assert all(r["status"]["status_str"] == "success" for r in results)
+    # Well inside the 10 s history recheck, so the messages did the work
+    assert time.monotonic() - start < 5
+
+def test_states_are_dropped_after_the_trailing_executing_message(server, tmp_path):
+    client = _client(server, tmp_path)
+    for _ in range(3):
+        PendingPrompt(client, client._post_workflow(PROMPT), lambda r: r).wait(timeout=30)
+    time.sleep(0.3)  # let the executing/node None that follows execution_success arrive
+    assert client.events._states == {}
+
+def test_completion_before_watch_is_not_lost(server, tmp_path):
+    client = _client(server, tmp_path)
+    # A cached prompt can finish before its POST /prompt response is read
+    client.events._handle({"type": "execution_success", "data": {"prompt_id": "early"}})
+    client.events.watch("early")
+    assert client.events.wait("early", timeout=0.1).done
+
+def test_unwatched_messages_are_bounded(server, tmp_path):
+    client = _client(server, tmp_path)
+    for i in range(client.events.unclaimed_limit * 2):
+        client.events._handle({"type": "executing", "data": {"node": None, "prompt_id": f"other-{i}"}})
+    assert client.events._states == {}
+    assert len(client.events._unclaimed) == client.events.unclaimed_limit
+
+def test_execution_error_fails_the_wait(tmp_path):
+    server = FakeComfyServer(latency=0.05, failure_rate=1.0).start()
+    try:
+        client = _client(server, tmp_path)
+        pending = PendingPrompt(client, client._post_workflow(PROMPT), lambda r: r)
+        with pytest.raises(RuntimeError, match="simulated failure"):
+            pending.wait(timeout=30)
+    finally:
+        server.stop()
@@ -0,0 +1,35 @@
+import pytest
+from utils.cost_model import CostModel, CostPlan
+
+def test_fits_fixed_and_per_unit_cost():
+    model = CostModel()
+    for units in (10, 20, 40):
+        model.observe("wan", units, 5 + 0.5 * units)
+    assert model.predict("wan", 30) == pytest.approx(20)
+    # Two jobs pay the fixed cost twice
+    assert model.predict("wan", 30, jobs=2) == pytest.approx(25)
+
+def test_sparse_keys_fall_back_to_a_rate():
+    model = CostModel()
+    assert model.predict("wan", 10) is None
+    model.observe("wan", 10, 30)
+    assert model.predict("wan", 20) == pytest.approx(60)
+    # A key never seen is priced at the pooled rate of the others
+    assert model.predict("other", 5) == pytest.approx(15)
+
+def test_history_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cost_model.json")
+    model = CostModel(path)
+    model.observe("wan", 10, 10)
+    model.observe("wan", 20, 15)
+    model.save()
+    assert CostModel(path).predict("wan", 40) == pytest.approx(25)
+
+def test_plan_reprices_what_is_left():
+    model = CostModel()
+    model.observe("wan", 10, 20)
+    plan = CostPlan(model, slots=2)
+    plan.add("wan", 30, jobs=3)
+    assert plan.remaining() == (3, pytest.approx(60))
+    plan.finish("wan", 10)
+    assert plan.remaining() == (2, pytest.approx(40))
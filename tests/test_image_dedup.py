@@ -0,0 +1,34 @@
+import cv2
+import numpy as np
+from utils.image_dedup import ImageHashIndex, NearDuplicateFilter
+
+def _image(path, pattern, noise=0):
+    rng = np.random.default_rng(0)
+    image = pattern.astype(np.int16) + rng.integers(-noise, noise + 1, pattern.shape)
+    cv2.imwrite(str(path), np.clip(image, 0, 255).astype(np.uint8))
+    return str(path)
+
+def _blocks(seed):
+    # Coarse random blocks: structure both hashes see, unlike the fine noise added on top
+    blocks = np.random.default_rng(seed).integers(0, 256, (8, 8)).astype(np.uint8)
+    return cv2.resize(blocks, (64, 64), interpolation=cv2.INTER_NEAREST)
+
+def test_near_duplicates_are_dropped_per_group(tmp_path):
+    original = _image(tmp_path / "a.png", _blocks(1))
+    noisy = _image(tmp_path / "b.png", _blocks(1), noise=4)
+    other = _image(tmp_path / "c.png", _blocks(2))
+    dedup = NearDuplicateFilter(ImageHashIndex(), threshold=5)
+
+    assert dedup.filter("anna", [original, noisy, other]) == [original, other]
+    # Another influencer's images don't count
+    assert dedup.keep("ben", noisy)
+
+def test_images_from_earlier_runs_count_as_kept(tmp_path):
+    earlier = _image(tmp_path / "earlier.png", _blocks(1))
+    new = _image(tmp_path / "new.png", _blocks(1), noise=4)
+    dedup = NearDuplicateFilter(ImageHashIndex(method="phash"), threshold=8)
+    dedup.seed("anna", [earlier])
+
+    assert not dedup.keep("anna", new)
+    # Seeded images themselves aren't filtered when they come round again
+    assert dedup.keep("anna", earlier)
@@ -0,0 +1,65 @@
+import os
+import pytest
+from benchmarks.fake_comfy_server import FakeComfyServer
+from clients.comfy_client import PendingPrompt
+from clients.comfy_pool import ComfyUIPool
+from models.config_model import ComfyServer
+from utils.job_journal import DONE, QUEUED, JobJournal, in_shard, make_job_id
+
+PROMPT = {"1": {"class_type": "SaveImage", "inputs": {}}}
+
+def test_resume_reopens_the_run_and_its_seed(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    journal = JobJournal(path)
+    journal.mark_done("a", ["x.png", "y.png"])
+    seed = journal.seed
+    journal.close()
+
+    resumed = JobJournal(path, resume=True)
+    assert resumed.seed == seed
+    assert resumed.get("a") == {"status": DONE, "server": None, "prompt_id": None, "output_path": ["x.png", "y.png"]}
+    resumed.close()
+
+    fresh = JobJournal(path)
+    assert fresh.run_id != resumed.run_id and fresh.get("a") is None
+    fresh.close()
+
+def test_shards_split_the_job_space():
+    ids = [make_job_id("wf", i) for i in range(200)]
+    owners = [[index for index in (1, 2, 3) if in_shard(job_id, index, 3)] for job_id in ids]
+    assert all(len(o) == 1 for o in owners)
+    assert make_job_id("wf", 1) == make_job_id("wf", "1")
+
+@pytest.fixture
+def server():
+    server = FakeComfyServer(latency=0.05, output_bytes=16).start()
+    yield server
+    server.stop()
+
+def test_run_jobs_skips_finished_jobs_and_reattaches_queued_ones(server, tmp_path):
+    pool = ComfyUIPool([ComfyServer(url=server.url)], str(tmp_path), health_interval=0)
+    journal = JobJournal(str(tmp_path / "jobs.db"))
+    pool.attach_journal(journal)
+
+    finished = tmp_path / "done.png"
+    finished.write_bytes(b"png")
+    journal.mark_done("done", str(finished))
+    client = pool.clients[0]
+    earlier = client._post_workflow(PROMPT)  # posted by the "crashed" process
+    journal.mark_queued("queued", client.comfy_url, earlier)
+
+    submitted, done = [], {}
+
+    def submit(client, job):
+        submitted.append((job["id"], job.get("prompt_id")))
+        prompt_id = job.get("prompt_id") or client._post_workflow(PROMPT)
+        return PendingPrompt(client, prompt_id, lambda r: f"{job['id']}.png", use_events="prompt_id" not in job)
+
+    jobs = [{"id": job_id} for job_id in ("done", "queued", "new")]
+    pool.run_jobs(jobs, submit, on_done=lambda job, output: done.update({job["id"]: output}),
+                  on_error=lambda job, e: pytest.fail(str(e)))
+
+    assert sorted(submitted) == [("new", None), ("queued", earlier)]
+    assert done == {"done": str(finished), "queued": "queued.png", "new": "new.png"}
+    assert journal.get("queued")["status"] == DONE and journal.get("new")["status"] == DONE
+    journal.close()
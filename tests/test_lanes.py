@@ -0,0 +1,63 @@
+import threading
+import pytest
+from benchmarks.fake_comfy_server import FakeComfyServer
+from clients.comfy_client import PendingPrompt
+from clients.comfy_pool import ComfyUIPool
+from models.config_model import ComfyServer
+from utils.lanes import LaneScheduler
+
+PROMPT = {"1": {"class_type": "SaveImage", "inputs": {}}}
+
+@pytest.fixture
+def server():
+    server = FakeComfyServer(latency=0.02, output_bytes=16).start()
+    yield server
+    server.stop()
+
+def test_busy_lanes_share_slots_by_weight(server, tmp_path):
+    pool = ComfyUIPool([ComfyServer(url=server.url)], str(tmp_path), health_interval=0, lanes={"a": 4, "b": 1})
+    order = []
+    lock = threading.Lock()
+    both_open = threading.Barrier(2)
+
+    def run(lane, count):
+        def submit(client, job):
+            with lock:
+                order.append(lane)
+            return PendingPrompt(client, client._post_workflow(PROMPT), lambda r: "out")
+
+        def jobs():
+            both_open.wait()
+            yield from ({"n": i} for i in range(count))
+
+        pool.run_jobs(jobs(), submit, on_done=lambda job, output: None,
+                      on_error=lambda job, e: None, lane=lane)
+
+    threads = [threading.Thread(target=run, args=("a", 50)), threading.Thread(target=run, args=("b", 15))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # While both lanes have work, a starts four jobs for every one of b's
+    window = order[:50]
+    assert 36 <= window.count("a") <= 44, "".join(window)
+
+def test_lane_catches_up_only_after_going_idle():
+    lanes = LaneScheduler({"a": 4, "b": 1})
+    lanes.open("a")
+    lanes.open("b")
+    for _ in range(8):
+        lanes.arrive("b")
+        lanes.started("b")
+        lanes.leave("b")
+    lanes.arrive("b")
+    # a never left, so it keeps the turns b got ahead on
+    lanes.arrive("a")
+    assert lanes.lane("a").pass_value == 0
+
+    lanes.leave("a")
+    lanes.close("a")
+    lanes.open("a")
+    # Back from idle it starts level with b rather than replaying b's lead
+    assert lanes.lane("a").pass_value == lanes.lane("b").pass_value
@@ -0,0 +1,97 @@
+import threading
+import time
+import pytest
+from benchmarks.fake_comfy_server import FakeComfyServer
+from clients.comfy_client import PendingPrompt
+from clients.comfy_pool import ComfyUIPool
+from models.config_model import ComfyServer
+
+PROMPT = {"1": {"class_type": "SaveImage", "inputs": {}}}
+
+@pytest.fixture
+def servers():
+    # The first accepts prompts and answers probes but never finishes anything
+    hung = FakeComfyServer(latency=3600, output_bytes=16).start()
+    good = FakeComfyServer(latency=0.3, output_bytes=16).start()
+    yield hung, good
+    hung.stop()
+    good.stop()
+
+def _pool(servers, tmp_path, **kwargs):
+    kwargs = {"job_timeout": 0.5, "health_interval": 0.1, "failure_threshold": 2, "max_retries": 5, **kwargs}
+    return ComfyUIPool([ComfyServer(url=s.url) for s in servers], str(tmp_path), **kwargs)
+
+def _run(pool, count):
+    done, failed, servers = [], [], []
+    lock = threading.Lock()
+
+    def submit(client, job):
+        with lock:
+            servers.append((job["n"], client.comfy_url))
+        return PendingPrompt(client, client._post_workflow(PROMPT), lambda r: "out")
+
+    pool.run_jobs(
+        [{"n": i} for i in range(count)], submit,
+        on_done=lambda job, output: done.append(job["n"]),
+        on_error=lambda job, e: failed.append((job["n"], e))
+    )
+    return done, failed, servers
+
+def test_hung_server_trips_the_breaker_despite_passing_probes(servers, tmp_path):
+    hung, good = servers
+    pool = _pool(servers, tmp_path, breaker_cooldown=60)
+    done, failed, _ = _run(pool, 10)
+
+    assert sorted(done) == list(range(10)) and not failed
+    hung_client = pool._client_for(hung.url)
+    # Probes have passed every 0.1 s meanwhile; only a finished job may close it
+    assert hung_client.down.is_set()
+    assert good.stats()["completed"] == 10
+
+def test_half_open_server_takes_one_trial_job_and_closes_on_success(servers, tmp_path):
+    _, good = servers
+    pool = _pool(servers, tmp_path, breaker_cooldown=0)
+    client = pool._client_for(good.url)
+    for _ in range(pool.failure_threshold):
+        pool.record_failure(client, "timed out")
+    assert client.down.is_set()
+
+    deadline = time.monotonic() + 5
+    while client.down.is_set() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert pool.status()["servers"][1]["half_open"]
+    assert pool._has_room(client)
+    with pool._cond:
+        pool._in_flight[client.comfy_url] += 1
+    # Capacity is one while it is on trial
+    assert not pool._has_room(client)
+
+    pool.record_success(client)
+    assert not pool.status()["servers"][1]["half_open"]
+
+def test_failed_trial_job_trips_it_again(servers, tmp_path):
+    _, good = servers
+    pool = _pool(servers, tmp_path, breaker_cooldown=0)
+    client = pool._client_for(good.url)
+    with pool._cond:
+        pool._half_open.add(client.comfy_url)
+    pool.record_failure(client, "timed out")
+    assert client.down.is_set()
+    assert not pool.status()["servers"][1]["half_open"]
+
+def test_retry_avoids_the_server_that_failed_the_job(servers, tmp_path):
+    hung, good = servers
+    # The hung server stays in rotation and, with no queue sampling, ties with the idle one
+    pool = _pool(servers, tmp_path, failure_threshold=100, queue_refresh_seconds=3600)
+    done, failed, submitted = _run(pool, 1)
+
+    assert done == [0] and not failed
+    assert submitted == [(0, hung.url), (0, good.url)]
+
+def test_excluded_server_is_used_when_no_other_is_up(servers, tmp_path):
+    hung, good = servers
+    pool = _pool(servers, tmp_path, health_interval=0)
+    pool._client_for(good.url).down.set()
+    client = pool.acquire(exclude={hung.url})
+    assert client.comfy_url == hung.url
+    pool.release(client)
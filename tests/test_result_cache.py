@@ -0,0 +1,67 @@
+import json
+import os
+import pytest
+from benchmarks.fake_comfy_server import FakeComfyServer
+from clients.comfy_client import ComfyUIClient
+from clients.input_uploader import InputUploader
+from models.config_model import Workflow
+from utils.file_hash import FileHashCache
+from utils.result_cache import ResultCache
+
+def _file(path, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(str(tmp_path / "results"), FileHashCache(), max_bytes=250)
+    for key in ("aa01", "bb02"):
+        cache.store(key, ".bin", _file(tmp_path / f"{key}.bin", b"x" * 100))
+    assert cache.lookup("aa01", ".bin")  # now bb02 is the oldest
+    cache.store("cc03", ".bin", _file(tmp_path / "cc03.bin", b"x" * 100))
+
+    assert cache.lookup("aa01", ".bin") and cache.lookup("cc03", ".bin")
+    assert cache.lookup("bb02", ".bin") is None
+    assert cache._total == 200
+
+def test_index_picks_up_entries_from_earlier_runs(tmp_path):
+    folder = str(tmp_path / "results")
+    ResultCache(folder, FileHashCache(), max_bytes=1000).store("aa01", ".bin", _file(tmp_path / "a.bin", b"x" * 100))
+    cache = ResultCache(folder, FileHashCache(), max_bytes=150)
+    cache.store("bb02", ".bin", _file(tmp_path / "b.bin", b"x" * 100))
+    assert cache.lookup("aa01", ".bin") is None and cache.lookup("bb02", ".bin")
+
+@pytest.fixture
+def server():
+    server = FakeComfyServer(latency=0.05, output_bytes=16).start()
+    yield server
+    server.stop()
+
+def test_cache_hit_uploads_nothing(server, tmp_path):
+    template = {
+        "1": {"class_type": "LoadImage", "inputs": {"image": ""}},
+        "2": {"class_type": "VHS_LoadVideo", "inputs": {"video": ""}},
+        "3": {"class_type": "VHS_VideoCombine", "inputs": {"images": ["2", 0]}}
+    }
+    workflow_file = tmp_path / "animate.json"
+    workflow_file.write_text(json.dumps(template))
+    workflow = Workflow(name="animate", type="v2v", workflow_file=str(workflow_file),
+                        inputs={"person": 1, "video": 2}, output_node=3, uses_background=False)
+    inputs = {"person": _file(tmp_path / "in" / "person.png", b"person"),
+              "video": _file(tmp_path / "in" / "clip.mp4", b"clip")}
+
+    hashes = FileHashCache()
+    uploader = InputUploader(server.url, hashes, str(tmp_path / "cache"))
+    client = ComfyUIClient(server.url, str(tmp_path / "out"), use_websocket=False, uploader=uploader,
+                           result_cache=ResultCache(str(tmp_path / "results"), hashes, 1 << 20))
+    uploads = []
+    server_name = uploader.server_name
+    uploader.server_name = lambda path: uploads.append(path) or server_name(path)
+
+    first = client.queue_animate_workflow(workflow, inputs, "v2v").collect()
+    assert len(uploads) == 2 and os.path.exists(first)
+
+    second = client.queue_animate_workflow(workflow, inputs, "v2v")
+    assert second.cached and os.path.exists(second.collect())
+    assert len(uploads) == 2
@@ -0,0 +1,47 @@
+import cv2
+import numpy as np
+from utils.video_segments import output_overlap, plan_segments, stitch_segments
+
+def _write(path, values, fps=30.0):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (32, 32))
+    for value in values:
+        writer.write(np.full((32, 32, 3), value, dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+def _frames(path):
+    cap = cv2.VideoCapture(str(path))
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(int(frame.mean()))
+    cap.release()
+    return frames
+
+def test_plan_covers_the_video_with_overlap():
+    segments = plan_segments(100, 40, 8)
+    assert segments == [(0, 40), (32, 40), (64, 36)]
+    assert segments[-1][0] + segments[-1][1] == 100
+
+def test_plan_short_video_is_one_segment_after_start():
+    assert plan_segments(50, 81, 16, start=10) == [(10, 40)]
+
+def test_stitch_drops_the_shared_frames_once(tmp_path):
+    first = _write(tmp_path / "a.mp4", [40] * 10)
+    second = _write(tmp_path / "b.mp4", [200] * 10)
+    out = stitch_segments([first, second], 4, str(tmp_path / "out.mp4"))
+
+    frames = _frames(out)
+    assert len(frames) == 16
+    assert abs(frames[0] - 40) < 8 and abs(frames[-1] - 200) < 8
+    # The crossfade climbs from one segment's colour to the next
+    blended = frames[6:10]
+    assert blended == sorted(blended) and 40 < blended[0] and blended[-1] < 200
+
+def test_overlap_follows_the_rendered_frame_count(tmp_path):
+    # 20 loader frames rendered as 40 output frames (e.g. interpolated to 30 fps)
+    segment = _write(tmp_path / "seg.mp4", [0] * 40)
+    assert output_overlap(segment, 20, 6) == 12
+    assert output_overlap(str(tmp_path / "missing.mp4"), 20, 6) == 6
@@ -0,0 +1,54 @@
+from typing import Callable, Dict, List, Tuple
+
+class AffinityPicker:
+    """
+    Chooses which buffered job a server runs next so consecutive prompts on
+    that server share inputs and ComfyUI can reuse its cached node outputs.
+
+    key(job) returns one value per cacheable branch, most expensive first,
+    e.g. (video, person). A job scores for every branch matching what the
+    server ran last and loses score for branches another server is already
+    working through, so servers spread over different videos instead of all
+    splitting the same one. Ties go to the earliest job in the buffer, which
+    keeps the upstream ordering (and its influencer spread) otherwise intact.
+    """
+    def __init__(self, key: Callable[[dict], Tuple]):
+        self.key = key
+        self._last: Dict[str, Tuple] = {}
+        self.jobs = 0
+        self.hits: List[int] = []
+
+    def _score(self, server: str, job_key: Tuple) -> int:
+        last = self._last.get(server)
+        score = 0
+        for i, value in enumerate(job_key):
+            weight = 2 ** (len(job_key) - i)
+            if last is not None and last[i] == value:
+                score += weight
+            elif any(other[i] == value for url, other in self._last.items() if url != server):
+                score -= weight
+        return score
+
+    def pick(self, server: str, buffer: List[dict]) -> dict:
+        """Remove and return the best job in buffer for server"""
+        keys = [self.key(job) for job in buffer]
+        best = max(range(len(buffer)), key=lambda i: (self._score(server, keys[i]), -i))
+        job = buffer.pop(best)
+        self.record(server, keys[best])
+        return job
+
+    def record(self, server: str, job_key: Tuple) -> None:
+        """Note that server is now running a job with job_key"""
+        last = self._last.get(server)
+        if not self.hits:
+            self.hits = [0] * len(job_key)
+        if last is not None:
+            for i, value in enumerate(job_key):
+                if last[i] == value:
+                    self.hits[i] += 1
+        self.jobs += 1
+        self._last[server] = job_key
+
+    def hit_rates(self) -> List[float]:
+        """Fraction of jobs per branch whose inputs matched the server's previous job"""
+        return [h / self.jobs for h in self.hits] if self.jobs else []
@@ -0,0 +1,110 @@
+"""
+Local HTTP control endpoint for a running orchestrator (127.0.0.1 only).
+
+    GET  /status                       servers, lanes, running jobs and workflow runs
+    POST /enqueue                      {"workflow": name, "lane": "urgent", "weight": 4}
+    POST /lanes/<lane>/pause           start no new jobs from the lane
+    POST /lanes/<lane>/resume          (also lifts a cancel)
+    POST /lanes/<lane>/weight          {"weight": 2}
+    POST /lanes/<lane>/cancel          stop the lane and cancel its jobs on the servers
+    POST /jobs/<id>/cancel             cancel one job (queue delete or /interrupt on its server)
+    POST /drain                        start nothing new; exit once running jobs finish
+
+    curl -X POST localhost:8765/enqueue -d '{"workflow": "wan_v2v_keep_background", "lane": "urgent"}'
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlparse
+
+class NotFound(Exception):
+    """Unknown route, lane action or job (404)"""
+
+class ControlServer:
+    def __init__(self, pool, runner, port: int, host: str = "127.0.0.1"):
+        self.pool = pool
+        self.runner = runner  # AutoGenerator: start(workflow_name, lane), runs()
+        self._http = ThreadingHTTPServer((host, port), self._handler())
+        self._http.daemon_threads = True
+        self.url = f"http://{host}:{self._http.server_address[1]}"
+
+    def start(self) -> "ControlServer":
+        threading.Thread(target=self._http.serve_forever, name="control", daemon=True).start()
+        print(f"[Control] ✔ Listening on {self.url}")
+        return self
+
+    def stop(self) -> None:
+        self._http.shutdown()
+        self._http.server_close()
+
+    def _post(self, path: str, body: dict) -> dict:
+        parts = [unquote(p) for p in path.strip("/").split("/")]
+
+        if parts == ["enqueue"]:
+            lane = body.get("lane")
+            if lane and body.get("weight"):
+                self.pool.set_lane_weight(lane, float(body["weight"]))
+            return {"run": self.runner.start(body.get("workflow"), lane)}
+
+        if parts == ["drain"]:
+            self.pool.drain()
+            return {"draining": True}
+
+        if len(parts) == 3 and parts[0] == "lanes":
+            lane, action = parts[1], parts[2]
+            if action == "pause":
+                self.pool.pause_lane(lane)
+            elif action == "resume":
+                self.pool.resume_lane(lane)
+            elif action == "weight":
+                self.pool.set_lane_weight(lane, float(body["weight"]))
+            elif action == "cancel":
+                return {"lane": lane, "cancelled": self.pool.cancel_lane(lane)}
+            else:
+                raise NotFound(path)
+            print(f"[Control] Lane '{lane}': {action}")
+            return {"lane": lane, **self.pool.status()["lanes"].get(lane, {})}
+
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "cancel":
+            if not self.pool.cancel_job(parts[1]):
+                raise NotFound(f"No running job {parts[1]}")
+            print(f"[Control] Cancelling job {parts[1]}")
+            return {"job": parts[1], "cancelled": True}
+
+        raise NotFound(path)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, obj, code: int = 200):
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if urlparse(self.path).path.rstrip("/") == "/status":
+                    return self._json({**server.pool.status(), "runs": server.runner.runs()})
+                self._json({"error": "not found"}, 404)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                    return self._json(server._post(urlparse(self.path).path, body))
+                except NotFound as e:
+                    return self._json({"error": f"not found: {e}"}, 404)
+                except KeyError as e:
+                    return self._json({"error": f"missing field {e}"}, 400)
+                except (ValueError, TypeError) as e:
+                    return self._json({"error": str(e)}, 400)
+
+        return Handler
@@ -0,0 +1,151 @@
+import os
+import threading
+import time
+from typing import Dict, Tuple
+from utils.json_store import load_json, save_json
+
+def _format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    if minutes >= 60:
+        return f"{minutes // 60}h {minutes % 60:02d}m"
+    if minutes:
+        return f"{minutes}m {int(seconds % 60):02d}s"
+    return f"{seconds:.0f}s"
+
+def template_profile(workflow_file: str, template: dict) -> Tuple[str, float]:
+    """
+    (key, megapixels) of a workflow template: the key names the template and
+    the settings that change render time for the same frames (context window,
+    RIFE multiplier, resolution); megapixels is its largest width x height.
+    """
+    width, height = 720, 1280
+    settings = []
+    for node_id in sorted(template, key=str):
+        node = template[node_id]
+        inputs = node.get("inputs", {})
+        w, h = inputs.get("width"), inputs.get("height")
+        if isinstance(w, int) and isinstance(h, int) and w * h > width * height:
+            width, height = w, h
+        if isinstance(inputs.get("context_frames"), int):
+            settings.append(f"ctx{inputs['context_frames']}")
+        if "RIFE" in node.get("class_type", "") and isinstance(inputs.get("multiplier"), int):
+            settings.append(f"rife{inputs['multiplier']}")
+    name = os.path.splitext(os.path.basename(workflow_file.replace("\\", "/")))[0]
+    return "|".join([name, f"{width}x{height}", *settings]), width * height / 1e6
+
+class CostModel:
+    """
+    Predicts a job's render seconds as a + b * units per template key, where
+    units is frames x megapixels. The least-squares sums are kept on disk so
+    every finished job refines the fit for later runs. Keys with a single
+    observation, or none, fall back to a pooled seconds-per-unit rate.
+    """
+    def __init__(self, path: str = None):
+        self.path = path
+        self._sums: Dict[str, list] = load_json(path, {}, "Cost")  # key -> [n, Σx, Σy, Σxx, Σxy]
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+
+    def save(self) -> None:
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._sums.items()}
+        save_json(self.path, snapshot)
+
+    def observe(self, key: str, units: float, seconds: float) -> None:
+        with self._lock:
+            s = self._sums.setdefault(key, [0, 0.0, 0.0, 0.0, 0.0])
+            s[0] += 1
+            s[1] += units
+            s[2] += seconds
+            s[3] += units * units
+            s[4] += units * seconds
+            flush = time.monotonic() - self._saved_at > 30
+            if flush:
+                self._saved_at = time.monotonic()
+        if flush:
+            self.save()
+
+    def _coefficients(self, key: str):
+        """(a, b) for key, or None without any history"""
+        with self._lock:
+            s = self._sums.get(key)
+            if s and s[0] >= 2:
+                n, sx, sy, sxx, sxy = s
+                var = n * sxx - sx * sx
+                if var > 1e-9 * max(1.0, sxx * n):
+                    b = (n * sxy - sx * sy) / var
+                    a = (sy - b * sx) / n
+                    if b > 0 and a >= 0:
+                        return a, b
+            if s and s[1] > 0:
+                return 0.0, s[2] / s[1]
+            total_x = sum(v[1] for v in self._sums.values())
+            if total_x > 0:
+                return 0.0, sum(v[2] for v in self._sums.values()) / total_x
+        return None
+
+    def predict(self, key: str, units: float, jobs: int = 1):
+        """Render seconds for jobs jobs totalling units, or None without any history"""
+        coefficients = self._coefficients(key)
+        if coefficients is None:
+            return None
+        a, b = coefficients
+        return a * jobs + b * units
+
+class CostPlan:
+    """
+    Predicted work left in one run_jobs call, as {key: [jobs, units]}.
+    Jobs are taken off as they finish and eta() re-prices what is left with
+    the model as it learns, spread over the pool's slots.
+    """
+    def __init__(self, model: CostModel, slots: int):
+        self.model = model
+        self.slots = max(1, slots)
+        self._left: Dict[str, list] = {}
+        self._lock = threading.Lock()
+        self._printed_at = 0.0
+
+    def add(self, key: str, units: float, jobs: int = 1) -> None:
+        with self._lock:
+            left = self._left.setdefault(key, [0, 0.0])
+            left[0] += jobs
+            left[1] += units
+
+    def finish(self, key: str, units: float, jobs: int = 1) -> None:
+        with self._lock:
+            left = self._left.get(key)
+            if left:
+                left[0] = max(0, left[0] - jobs)
+                left[1] = max(0.0, left[1] - units)
+
+    def remaining(self):
+        """(jobs, predicted GPU seconds) still to run; seconds is None without history"""
+        with self._lock:
+            left = {k: list(v) for k, v in self._left.items() if v[0]}
+        jobs = sum(v[0] for v in left.values())
+        seconds = 0.0
+        for key, (n, units) in left.items():
+            predicted = self.model.predict(key, units, n)
+            if predicted is None:
+                return jobs, None
+            seconds += predicted
+        return jobs, seconds
+
+    def describe(self, label: str) -> None:
+        jobs, seconds = self.remaining()
+        if seconds is None:
+            print(f"[Cost] {label}: {jobs} jobs; no render timings recorded yet, so no estimate this run")
+            return
+        print(
+            f"[Cost] {label}: {jobs} jobs, predicted {seconds / 3600:.2f} GPU-hours"
+            f" (~{_format_duration(seconds / self.slots)} on {self.slots} slot(s))"
+        )
+
+    def print_eta(self, every: float = 30.0) -> None:
+        now = time.monotonic()
+        if now - self._printed_at < every:
+            return
+        self._printed_at = now
+        jobs, seconds = self.remaining()
+        if jobs and seconds is not None:
+            print(f"[ETA] ~{_format_duration(seconds / self.slots)} left ({jobs} jobs)")
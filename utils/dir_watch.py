@@ -0,0 +1,54 @@
+import os
+from typing import Callable, Dict, List, Tuple
+
+def scan_folder(folder: str, rule: Callable[[str], bool]) -> Dict[str, Tuple[int, int]]:
+    """{path: (size, mtime_ns)} of the files in folder matching rule, from a single scandir pass"""
+    snapshot = {}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if not rule(entry.name):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    st = entry.stat()
+                except OSError:
+                    continue  # removed between listing and stat
+                snapshot[entry.path] = (st.st_size, st.st_mtime_ns)
+    except FileNotFoundError:
+        pass
+    return snapshot
+
+class FolderWatcher:
+    """
+    Incremental view of one input folder. files() is the listing at
+    construction; each poll() rescans and returns the files that are new or
+    changed since they were last reported, once they have stopped changing
+    for one poll (so a download still being written isn't picked up half done).
+    """
+    def __init__(self, folder: str, rule: Callable[[str], bool]):
+        self.folder = folder
+        self.rule = rule
+        self._reported = scan_folder(folder, rule)
+        self._pending: Dict[str, Tuple[int, int]] = {}
+
+    def files(self) -> List[str]:
+        return sorted(self._reported)
+
+    def poll(self) -> List[str]:
+        current = scan_folder(self.folder, self.rule)
+        ready = []
+        pending = {}
+        for path, state in current.items():
+            if self._reported.get(path) == state:
+                continue
+            if self._pending.get(path) == state:
+                ready.append(path)
+                self._reported[path] = state
+            else:
+                pending[path] = state
+        self._pending = pending
+        for path in set(self._reported) - set(current):
+            del self._reported[path]
+        return sorted(ready)
@@ -0,0 +1,132 @@
+import os
+import re
+import shutil
+import threading
+import time
+import requests
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+def _expected_total(response: requests.Response, offset: int):
+    """Full file size from Content-Range / Content-Length, or None if unknown"""
+    content_range = response.headers.get("Content-Range")
+    if content_range:
+        m = re.match(r"bytes \d+-\d+/(\d+)", content_range)
+        if m:
+            return int(m.group(1))
+    length = response.headers.get("Content-Length")
+    if length is not None:
+        return int(length) + offset
+    return None
+
+def stream_download(
+    url: str,
+    save_path: str,
+    params: dict = None,
+    retries: int = 3,
+    timeout: tuple = (10, 120),
+    session: requests.Session = None
+) -> None:
+    """
+    Stream url into save_path in fixed-size chunks.
+    Bytes land in save_path + ".part" and are renamed into place only once
+    their size matches Content-Range / Content-Length (ComfyUI publishes no
+    checksum to verify against). A dropped connection resumes from the end of
+    the .part file with a Range request.
+    Pass session to reuse its pooled keep-alive connections.
+    """
+    http = session or requests
+    part_path = save_path + ".part"
+
+    for attempt in range(retries + 1):
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        try:
+            with http.get(url, params=params, headers=headers, stream=True, timeout=timeout) as r:
+                if offset and r.status_code == 416:
+                    # Nothing left past our offset: the .part is complete, or stale
+                    m = re.match(r"bytes \*/(\d+)", r.headers.get("Content-Range", ""))
+                    if not m or int(m.group(1)) != offset:
+                        os.remove(part_path)
+                        raise IOError("Discarded stale partial download")
+                    total = offset
+                else:
+                    if r.status_code >= 500:
+                        raise IOError(f"Server error {r.status_code}")
+                    if r.status_code not in (200, 206):
+                        raise RuntimeError(f"Error downloading file: {r.status_code} {r.text[:200]}")
+                    if r.status_code == 200:
+                        # Server ignored the Range header; start over
+                        offset = 0
+                    total = _expected_total(r, offset)
+
+                    with open(part_path, "ab" if offset else "wb") as f:
+                        for chunk in r.iter_content(chunk_size=CHUNK_SIZE):
+                            f.write(chunk)
+
+            size = os.path.getsize(part_path)
+            if total is not None and size != total:
+                raise IOError(f"Incomplete download: {size} of {total} bytes")
+
+            os.replace(part_path, save_path)
+            return
+
+        except (requests.RequestException, IOError) as e:
+            if attempt == retries:
+                raise RuntimeError(f"Download of {url} failed after {retries + 1} attempts: {e}")
+            print(f"[Download] Retrying ({attempt + 1}/{retries}) after error: {e}")
+            time.sleep(min(2 ** attempt, 30))
+
+FICLONE = 0x40049409  # Linux ioctl: share extents with another file (btrfs, XFS, ...)
+
+def _reflink(src: str, dest: str) -> bool:
+    try:
+        import fcntl
+    except ImportError:  # Windows
+        return False
+    try:
+        with open(src, "rb") as s, open(dest, "wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dest):
+            os.remove(dest)
+        return False
+
+def retrieve_local(src: str, dest: str, move: bool = False):
+    """
+    Place a file the server wrote to storage we can reach at dest without
+    sending it through the server again: rename it (move=True), else hard-link,
+    else reflink, else copy on the storage side. Returns the method used, or
+    None when src isn't reachable and the caller should download it instead.
+    """
+    if not os.path.isfile(src):
+        return None
+    tmp_path = f"{dest}.{threading.get_ident()}.tmp"
+
+    if move:
+        try:
+            os.replace(src, dest)
+            return "move"
+        except OSError:
+            pass  # another filesystem; fall through
+    try:
+        os.link(src, tmp_path)
+        method = "link"
+    except OSError:
+        if _reflink(src, tmp_path):
+            method = "reflink"
+        else:
+            try:
+                shutil.copyfile(src, tmp_path)  # copy_file_range/sendfile; no HTTP round trip
+            except OSError:
+                return None
+            method = "copy"
+    os.replace(tmp_path, dest)
+    if move:
+        try:
+            os.remove(src)
+        except OSError:
+            pass
+    return method
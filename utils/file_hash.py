@@ -0,0 +1,75 @@
+import hashlib
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable
+from utils.json_store import load_json, save_json
+
+CHUNK_SIZE = 1 << 20  # 1 MiB
+
+def sha256_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+class FileHashCache:
+    """
+    sha256 of local files, persisted and keyed by path, size and mtime so a
+    file is only read again when it changes. prefetch() hashes in background
+    threads (hashlib releases the GIL) while the caller carries on.
+    """
+    def __init__(self, index_path: str = None, max_workers: int = 4):
+        self.index_path = index_path
+        self._entries = load_json(index_path, {}, "Hash")
+        self._pending: Dict[str, Future] = {}
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hash")
+
+    def save(self) -> None:
+        with self._lock:
+            snapshot = dict(self._entries)
+        save_json(self.index_path, snapshot)
+
+    def _cached(self, key: str, st: os.stat_result):
+        entry = self._entries.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            return entry["sha256"]
+        return None
+
+    def _compute(self, key: str, st: os.stat_result) -> str:
+        digest = sha256_file(key)
+        with self._lock:
+            self._entries[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": digest}
+            self._pending.pop(key, None)
+            self._unsaved += 1
+            # Batch index writes while a prefetch is still churning through files
+            flush = not self._pending or self._unsaved >= 50
+            if flush:
+                self._unsaved = 0
+        if flush:
+            self.save()
+        return digest
+
+    def _future(self, path: str) -> Future:
+        key = os.path.abspath(path)
+        st = os.stat(key)
+        with self._lock:
+            digest = self._cached(key, st)
+            if digest:
+                done = Future()
+                done.set_result(digest)
+                return done
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = self._executor.submit(self._compute, key, st)
+            return future
+
+    def prefetch(self, paths: Iterable[str]) -> None:
+        for path in dict.fromkeys(paths):
+            self._future(path)
+
+    def hash(self, path: str) -> str:
+        return self._future(path).result()
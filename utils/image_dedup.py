@@ -0,0 +1,141 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List
+import cv2
+import numpy as np
+from utils.json_store import load_json, save_json
+
+_BYTE_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _read_gray(image_path: str) -> np.ndarray:
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise RuntimeError(f"Failed to read image: {image_path}")
+    return image
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+
+def dhash(image_path: str, size: int = 8) -> int:
+    """64-bit difference hash: sign of the horizontal gradient on a (size+1) x size thumbnail"""
+    thumb = cv2.resize(_read_gray(image_path), (size + 1, size), interpolation=cv2.INTER_AREA)
+    return _pack(thumb[:, 1:] > thumb[:, :-1])
+
+def phash(image_path: str, size: int = 8) -> int:
+    """64-bit perceptual hash: low-frequency DCT coefficients of a 32x32 thumbnail against their median"""
+    thumb = cv2.resize(_read_gray(image_path), (size * 4, size * 4), interpolation=cv2.INTER_AREA)
+    low = cv2.dct(np.float32(thumb))[:size, :size]
+    return _pack(low > np.median(low.flatten()[1:]))  # DC term left out of the median
+
+HASHES = {"dhash": dhash, "phash": phash}
+
+def hamming(hashes: np.ndarray, value: int) -> np.ndarray:
+    """Bit distance from value to every uint64 in hashes, vectorised"""
+    xor = np.bitwise_xor(hashes, np.uint64(value))
+    return _BYTE_POPCOUNT[xor.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+
+def _try_hash(method: str, image_path: str):
+    try:
+        return HASHES[method](image_path)
+    except Exception as e:
+        print(f"[Dedup] ✖ {os.path.basename(image_path)}: {e}")
+        return None
+
+class ImageHashIndex:
+    """
+    On-disk image hash index keyed by path, size and mtime, so each generated
+    image is hashed once however many runs look at it. method picks dHash
+    (default) or pHash; an entry can hold both.
+    """
+    def __init__(self, index_path: str = None, max_workers: int = 4, method: str = "dhash"):
+        if method not in HASHES:
+            raise ValueError(f"Unknown image hash '{method}' (expected one of {', '.join(HASHES)})")
+        self.index_path = index_path
+        self.max_workers = max_workers
+        self.method = method
+        self._entries = load_json(index_path, {}, "Dedup")
+        self._lock = threading.Lock()
+
+    def save(self) -> None:
+        with self._lock:
+            snapshot = dict(self._entries)
+        save_json(self.index_path, snapshot)
+
+    def _cached(self, key: str, st: os.stat_result):
+        entry = self._entries.get(key)
+        if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns and self.method in entry:
+            return int(entry[self.method], 16)
+        return None
+
+    def hashes(self, image_paths: Iterable[str]) -> Dict[str, int]:
+        """Hash of every readable path, computing only the new or changed ones (in threads)"""
+        result, missing = {}, []
+        for path in dict.fromkeys(image_paths):
+            key = os.path.abspath(path)
+            st = os.stat(key)
+            with self._lock:
+                value = self._cached(key, st)
+            if value is None:
+                missing.append((path, key, st))
+            else:
+                result[path] = value
+
+        if missing:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                computed = list(executor.map(lambda item: _try_hash(self.method, item[0]), missing))
+            with self._lock:
+                for (path, key, st), value in zip(missing, computed):
+                    if value is None:
+                        continue
+                    entry = self._entries.get(key)
+                    if not entry or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+                        entry = self._entries[key] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+                    entry[self.method] = f"{value:016x}"
+                    result[path] = value
+            self.save()
+        return result
+
+class NearDuplicateFilter:
+    """
+    Keeps an image only if its hash is more than threshold bits away from
+    every image already kept in the same group (e.g. influencer), including
+    the images the group was seeded with from earlier runs.
+    """
+    def __init__(self, index: ImageHashIndex, threshold: int):
+        self.index = index
+        self.threshold = threshold
+        self._kept: Dict[str, np.ndarray] = {}
+        self._paths: Dict[str, set] = {}
+        self._lock = threading.Lock()
+
+    def _add(self, group: str, image_path: str, value: int) -> None:
+        kept = self._kept.get(group)
+        self._kept[group] = np.append(kept if kept is not None else np.empty(0, np.uint64), np.uint64(value))
+        self._paths.setdefault(group, set()).add(os.path.abspath(image_path))
+
+    def seed(self, group: str, image_paths: List[str]) -> None:
+        """Count existing images (earlier runs) as kept, without filtering them"""
+        hashes = self.index.hashes(image_paths)
+        with self._lock:
+            for path, value in hashes.items():
+                if os.path.abspath(path) not in self._paths.get(group, ()):
+                    self._add(group, path, value)
+
+    def keep(self, group: str, image_path: str) -> bool:
+        value = self.index.hashes([image_path]).get(image_path)
+        if value is None:
+            return True  # unreadable images are never treated as duplicates
+        with self._lock:
+            if os.path.abspath(image_path) in self._paths.get(group, ()):
+                return True  # already counted (e.g. seeded, then reattached by --resume)
+            kept = self._kept.get(group)
+            if kept is not None and len(kept) and hamming(kept, value).min() <= self.threshold:
+                return False
+            self._add(group, image_path, value)
+            return True
+
+    def filter(self, group: str, image_paths: List[str]) -> List[str]:
+        """Order-preserving filter of a whole list, hashing it in one batch first"""
+        self.index.hashes(image_paths)
+        return [path for path in image_paths if self.keep(group, path)]
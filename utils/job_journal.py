@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+
+QUEUED = "queued"
+DONE = "done"
+FAILED = "failed"
+
+def make_job_id(*parts) -> str:
+    """Deterministic job ID from the values that define a job"""
+    return hashlib.sha1(json.dumps([str(p) for p in parts]).encode("utf-8")).hexdigest()[:16]
+
+def in_shard(job_id: str, index: int, count: int) -> bool:
+    """Whether job_id belongs to shard index (1-based) of count"""
+    return int(job_id, 16) % count == index - 1
+
+class JobJournal:
+    """
+    SQLite log of every job in a run: status, server, prompt_id and output path.
+    Each run gets its own run_id and RNG seed; resuming reopens the latest run
+    so the same seed rebuilds the same job list and finished jobs are skipped.
+    """
+    def __init__(self, db_path: str, resume: bool = False):
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                seed INTEGER NOT NULL,
+                started_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                run_id INTEGER NOT NULL,
+                job_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                server TEXT,
+                prompt_id TEXT,
+                output_path TEXT,
+                error TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (run_id, job_id)
+            );
+        """)
+
+        row = self._db.execute("SELECT run_id, seed FROM runs ORDER BY run_id DESC LIMIT 1").fetchone()
+        if resume and row:
+            self.run_id, self.seed = row
+            counts = dict(self._db.execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE run_id = ? GROUP BY status", (self.run_id,)
+            ).fetchall())
+            print(f"[Journal] Resuming run {self.run_id}: {counts}")
+        else:
+            if resume:
+                print("[Journal] Nothing to resume, starting a new run")
+            self.seed = random.randint(0, 2**31 - 1)
+            cur = self._db.execute("INSERT INTO runs (seed, started_at) VALUES (?, ?)", (self.seed, time.time()))
+            self.run_id = cur.lastrowid
+
+    def _upsert(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = time.time()
+        columns = ", ".join(fields)
+        updates = ", ".join(f"{k} = excluded.{k}" for k in fields)
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO jobs (run_id, job_id, {columns}) "
+                f"VALUES (?, ?, {', '.join('?' for _ in fields)}) "
+                f"ON CONFLICT (run_id, job_id) DO UPDATE SET {updates}",
+                (self.run_id, job_id, *fields.values())
+            )
+
+    def get(self, job_id: str):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, server, prompt_id, output_path FROM jobs WHERE run_id = ? AND job_id = ?",
+                (self.run_id, job_id)
+            ).fetchone()
+        if not row:
+            return None
+        entry = dict(zip(("status", "server", "prompt_id", "output_path"), row))
+        if entry["output_path"]:
+            entry["output_path"] = json.loads(entry["output_path"])
+        return entry
+
+    def mark_queued(self, job_id: str, server: str, prompt_id: str) -> None:
+        self._upsert(job_id, status=QUEUED, server=server, prompt_id=prompt_id, error=None)
+
+    def mark_done(self, job_id: str, output_path) -> None:
+        """output_path is a path or, for batched jobs, a list of paths"""
+        self._upsert(job_id, status=DONE, output_path=json.dumps(output_path), error=None)
+
+    def mark_failed(self, job_id: str, error: str) -> None:
+        self._upsert(job_id, status=FAILED, error=error)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,27 @@
+import json
+import os
+import threading
+
+def write_atomic(path: str, text: str) -> None:
+    """Replace path with text in one step, so a reader or a crash never sees half a file"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+def load_json(path: str, default, tag: str):
+    """Parsed JSON at path, or default when there is none or it can't be read (reported under [tag])"""
+    if not path or not os.path.exists(path):
+        return default
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[{tag}] ✖ Ignoring unreadable {path}: {e}")
+        return default
+
+def save_json(path: str, data) -> None:
+    """Atomically write data to path as JSON; a no-op without a path"""
+    if path:
+        write_atomic(path, json.dumps(data))
@@ -0,0 +1,90 @@
+from typing import Dict
+
+DEFAULT_LANE = "default"
+
+class LaneClosed(RuntimeError):
+    """The lane was cancelled, or the pool is draining; no new jobs start from it"""
+
+class _Lane:
+    def __init__(self, weight: float):
+        self.weight = weight
+        self.paused = False
+        self.cancelled = False
+        self.pass_value = 0.0  # stride scheduling: grows by 1/weight per job started
+        self.waiting = 0
+        self.open = 0  # run_jobs calls currently feeding the lane
+        self.started = 0
+
+class LaneScheduler:
+    """
+    Weighted sharing of server slots between named lanes (stride
+    scheduling). Whenever a slot frees up it goes to the waiting lane that
+    has started the fewest jobs relative to its weight, so a weight-4 lane
+    starts four jobs for every one of a weight-1 lane while both have work.
+    Paused lanes start nothing; jobs already on a server carry on.
+
+    Not thread-safe on its own: ComfyUIPool calls it under its condition lock.
+    """
+    def __init__(self, weights: Dict[str, float] = None):
+        self._lanes: Dict[str, _Lane] = {}
+        self.draining = False
+        for name, weight in (weights or {}).items():
+            self.lane(name).weight = weight
+
+    def lane(self, name: str = None) -> _Lane:
+        name = name or DEFAULT_LANE
+        lane = self._lanes.get(name)
+        if lane is None:
+            lane = self._lanes[name] = _Lane(1.0)
+        return lane
+
+    def check_open(self, name: str = None) -> None:
+        if self.draining:
+            raise LaneClosed("Pool is draining")
+        if self.lane(name).cancelled:
+            raise LaneClosed(f"Lane '{name or DEFAULT_LANE}' was cancelled")
+
+    def _catch_up(self, lane: _Lane) -> None:
+        # A lane coming back from idle doesn't get to replay the turns it skipped
+        active = [l.pass_value for l in self._lanes.values() if (l.waiting or l.open) and l is not lane]
+        if active:
+            lane.pass_value = max(lane.pass_value, min(active))
+
+    def open(self, name: str = None) -> None:
+        """A run_jobs call starts feeding the lane"""
+        lane = self.lane(name)
+        if not lane.open and not lane.waiting:
+            self._catch_up(lane)
+        lane.open += 1
+
+    def close(self, name: str = None) -> None:
+        self.lane(name).open -= 1
+
+    def arrive(self, name: str = None) -> None:
+        lane = self.lane(name)
+        # An open lane is only between jobs when nothing waits; it never went idle
+        if not lane.open and not lane.waiting:
+            self._catch_up(lane)
+        lane.waiting += 1
+
+    def leave(self, name: str = None) -> None:
+        self.lane(name).waiting -= 1
+
+    def my_turn(self, name: str = None) -> bool:
+        lane = self.lane(name)
+        if lane.paused:
+            return False
+        contenders = [l for l in self._lanes.values() if l.waiting and not l.paused]
+        return lane.pass_value <= min(l.pass_value for l in contenders)
+
+    def started(self, name: str = None) -> None:
+        lane = self.lane(name)
+        lane.started += 1
+        lane.pass_value += 1.0 / max(lane.weight, 1e-6)
+
+    def status(self) -> Dict[str, dict]:
+        return {
+            name: {"weight": lane.weight, "paused": lane.paused, "cancelled": lane.cancelled,
+                   "waiting": lane.waiting, "started": lane.started}
+            for name, lane in sorted(self._lanes.items())
+        }
@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Dict, Tuple
+from utils.json_store import write_atomic
+
+def _label_key(labels: dict) -> Tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+def _format_labels(key: Tuple) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+def _format_seconds(seconds: float) -> str:
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f}h"
+    if seconds >= 60:
+        return f"{seconds / 60:.1f}m"
+    return f"{seconds:.2f}s"
+
+class _Stat:
+    """count/sum/max plus a window of recent samples for percentiles"""
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=2048)
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def percentile(self, q: float) -> float:
+        values = sorted(self.recent)
+        return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+class _PromptTimes:
+    def __init__(self, server: str, class_types: dict):
+        self.server = server
+        self.class_types = class_types
+        self.posted_at = time.monotonic()
+        self.started_at = None
+        self.node = None
+        self.node_started_at = None
+
+class Metrics:
+    """
+    Timings and counters for a run.
+    Spans (prep, queue_wait, execute, server, download, job) and per-node
+    execution times from ComfyUI's /ws events are appended to a JSON-lines
+    log as they happen; report() writes a Prometheus text file and prints a
+    summary. Everything is thread-safe.
+    """
+    def __init__(self, folder: str = None, prom_name: str = "comfy_orchestrator.prom"):
+        self.started_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, Tuple], _Stat] = defaultdict(_Stat)
+        self._counters: Dict[Tuple[str, Tuple], float] = defaultdict(float)
+        self._prompts: Dict[str, _PromptTimes] = {}
+
+        self._log = None
+        self.prom_path = None
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+            stamp = time.strftime("%Y%m%d_%H%M%S")
+            self._log = open(os.path.join(folder, f"run_{stamp}.jsonl"), "a", encoding="utf-8", buffering=1)
+            self.prom_path = os.path.join(folder, prom_name)
+
+    def _write(self, record: dict) -> None:
+        if self._log:
+            record["ts"] = round(time.time(), 3)
+            self._log.write(json.dumps(record) + "\n")
+
+    # -------------------------
+    # Recording
+    # -------------------------
+
+    def observe(self, name: str, seconds: float, **labels) -> None:
+        with self._lock:
+            self._stats[(name, _label_key(labels))].add(seconds)
+            self._write({"kind": "span", "name": name, "seconds": round(seconds, 4), **labels})
+
+    def incr(self, name: str, value: float = 1, **labels) -> None:
+        with self._lock:
+            self._counters[(name, _label_key(labels))] += value
+            self._write({"kind": "count", "name": name, "value": value, **labels})
+
+    @contextmanager
+    def span(self, name: str, **labels):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, **labels)
+
+    # -------------------------
+    # Prompt lifecycle
+    # -------------------------
+
+    def prompt_posted(self, prompt_id: str, server: str, workflow: dict) -> None:
+        class_types = {str(node_id): node.get("class_type") for node_id, node in workflow.items()}
+        with self._lock:
+            self._prompts[prompt_id] = _PromptTimes(server, class_types)
+
+    def prompt_finished(self, prompt_id: str, ok: bool = True) -> None:
+        """Called once the result (or failure) has been seen, with or without /ws"""
+        with self._lock:
+            times = self._prompts.pop(prompt_id, None)
+        if times and ok:
+            self.observe("server", time.monotonic() - times.posted_at, server=times.server)
+
+    def _end_node(self, times: _PromptTimes, prompt_id: str, now: float) -> None:
+        if times.node is None:
+            return
+        class_type = times.class_types.get(times.node, "unknown")
+        seconds = now - times.node_started_at
+        self._stats[("node", _label_key({"class_type": class_type}))].add(seconds)
+        self._write({
+            "kind": "node", "prompt_id": prompt_id, "server": times.server,
+            "node": times.node, "class_type": class_type, "seconds": round(seconds, 4)
+        })
+        times.node = None
+
+    def on_event(self, msg_type: str, data: dict) -> None:
+        """ComfyEventListener callback: splits queue wait from execution and times each node"""
+        prompt_id = data.get("prompt_id")
+        now = time.monotonic()
+        with self._lock:
+            times = self._prompts.get(prompt_id)
+            if times is None:
+                return
+
+            if msg_type == "execution_start":
+                times.started_at = now
+                self._stats[("queue_wait", _label_key({"server": times.server}))].add(now - times.posted_at)
+                self._write({"kind": "span", "name": "queue_wait", "server": times.server,
+                             "seconds": round(now - times.posted_at, 4)})
+            elif msg_type == "execution_cached":
+                cached = len(data.get("nodes") or [])
+                self._counters[("nodes_cached", ())] += cached
+                self._write({"kind": "cached", "prompt_id": prompt_id, "nodes": data.get("nodes") or []})
+            elif msg_type == "executing":
+                self._end_node(times, prompt_id, now)
+                if data.get("node") is not None:
+                    times.node = str(data["node"])
+                    times.node_started_at = now
+                    self._counters[("nodes_executed", ())] += 1
+                elif times.started_at is not None:
+                    self._stats[("execute", _label_key({"server": times.server}))].add(now - times.started_at)
+                    self._write({"kind": "span", "name": "execute", "server": times.server,
+                                 "seconds": round(now - times.started_at, 4)})
+                    times.started_at = None
+            elif msg_type in ("execution_error", "execution_interrupted"):
+                self._end_node(times, prompt_id, now)
+
+    # -------------------------
+    # Reporting
+    # -------------------------
+
+    def write_prometheus(self) -> None:
+        if not self.prom_path:
+            return
+        with self._lock:
+            stats = list(self._stats.items())
+            counters = list(self._counters.items())
+
+        lines = []
+        for (name, key), stat in sorted(stats):
+            labels = _format_labels(key)
+            lines.append(f"comfy_{name}_seconds_sum{labels} {stat.total:.4f}")
+            lines.append(f"comfy_{name}_seconds_count{labels} {stat.count}")
+            lines.append(f"comfy_{name}_seconds_max{labels} {stat.max:.4f}")
+        for (name, key), value in sorted(counters):
+            lines.append(f"comfy_{name}_total{_format_labels(key)} {value:g}")
+        lines.append(f"comfy_run_elapsed_seconds {time.monotonic() - self.started_at:.1f}")
+
+        write_atomic(self.prom_path, "\n".join(lines) + "\n")
+
+    def report(self) -> None:
+        """Write the Prometheus file, print the end-of-run summary and close the log"""
+        self.write_prometheus()
+        elapsed = time.monotonic() - self.started_at
+
+        with self._lock:
+            stats = dict(self._stats)
+            counters = dict(self._counters)
+
+        print(f"\n[Metrics] Run summary ({_format_seconds(elapsed)} elapsed)")
+
+        jobs = defaultdict(dict)
+        for (name, key), value in counters.items():
+            if name == "jobs":
+                labels = dict(key)
+                jobs[labels.get("stage", "jobs")][labels.get("status", "done")] = int(value)
+        for stage, by_status in sorted(jobs.items()):
+            done = by_status.get("done", 0)
+            rate = done / elapsed * 3600 if elapsed else 0.0
+            detail = ", ".join(f"{status} {count}" for status, count in sorted(by_status.items()))
+            print(f"  {stage}: {detail} ({rate:.1f} jobs/h)")
+
+        merged = defaultdict(_Stat)
+        for (name, _), stat in stats.items():
+            if name != "node":
+                target = merged[name]
+                target.count += stat.count
+                target.total += stat.total
+                target.max = max(target.max, stat.max)
+                target.recent.extend(stat.recent)
+        if merged:
+            print("  Spans (mean / p95 / max, count):")
+            for name, stat in sorted(merged.items(), key=lambda item: -item[1].total):
+                print(
+                    f"    {name:<11} {_format_seconds(stat.total / stat.count):>8} / "
+                    f"{_format_seconds(stat.percentile(0.95)):>8} / {_format_seconds(stat.max):>8}  ({stat.count})"
+                )
+
+        nodes = sorted(
+            ((dict(key).get("class_type"), stat) for (name, key), stat in stats.items() if name == "node"),
+            key=lambda item: -item[1].total
+        )
+        if nodes:
+            node_total = sum(stat.total for _, stat in nodes)
+            print("  Slowest nodes (share of node time, mean):")
+            for class_type, stat in nodes[:8]:
+                print(
+                    f"    {class_type:<32} {stat.total / node_total:6.1%}  "
+                    f"{_format_seconds(stat.total / stat.count):>8}  ({stat.count})"
+                )
+        executed = counters.get(("nodes_executed", ()), 0)
+        cached = counters.get(("nodes_cached", ()), 0)
+        if executed + cached:
+            print(f"  Node cache: {cached:g} of {executed + cached:g} nodes served from ComfyUI's cache")
+
+        if self._log:
+            self._log.close()
+            self._log = None
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import Iterable
+from utils.file_hash import FileHashCache
+
+def link_or_copy(src: str, dest: str) -> None:
+    """Hard-link src to dest (atomically replacing dest), copying when linking isn't possible"""
+    tmp_path = f"{dest}.{threading.get_ident()}.tmp"
+    try:
+        os.link(src, tmp_path)
+    except OSError:
+        shutil.copyfile(src, tmp_path)
+    os.replace(tmp_path, dest)
+
+class ResultCache:
+    """
+    Rendered outputs keyed by a hash of the fully patched prompt graph.
+    Local input paths inside the graph are replaced by their content hashes
+    before hashing, so moving or renaming an input still hits while editing
+    it misses. Least recently used entries are evicted past max_bytes.
+
+    Sizes and use order are indexed in memory: the folder is scanned once,
+    on the first store, not on every one.
+    """
+    def __init__(self, folder: str, hashes: FileHashCache, max_bytes: int):
+        self.folder = folder
+        self.hashes = hashes
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = None  # path -> size, least recently used first; see _load_index()
+        self._total = 0
+        os.makedirs(folder, exist_ok=True)
+
+    def _load_index(self) -> None:
+        entries = []
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, path, st.st_size))
+        self._index = OrderedDict((path, size) for _, path, size in sorted(entries))
+        self._total = sum(self._index.values())
+
+    def _touch(self, path: str, size: int) -> None:
+        """Record path as the most recently used entry"""
+        if self._index is None:
+            return
+        self._total += size - self._index.pop(path, 0)
+        self._index[path] = size
+
+    def key(self, workflow_data: dict, input_files: Iterable[str]) -> str:
+        content = {path: f"sha256:{self.hashes.hash(path)}" for path in input_files if path and os.path.isfile(path)}
+
+        def _canonical(value):
+            if isinstance(value, dict):
+                return {k: _canonical(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [_canonical(v) for v in value]
+            if isinstance(value, str) and value in content:
+                return content[value]
+            return value
+
+        # _meta carries UI titles only; it doesn't change what gets rendered
+        graph = {
+            node_id: _canonical({k: v for k, v in node.items() if k != "_meta"})
+            for node_id, node in workflow_data.items()
+        }
+        blob = json.dumps(graph, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str, ext: str) -> str:
+        return os.path.join(self.folder, key[:2], key + ext)
+
+    def lookup(self, key: str, ext: str):
+        path = self._path(key, ext)
+        try:
+            os.utime(path)  # mtime doubles as last-used time for the next index scan
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        with self._lock:
+            self._touch(path, size)
+        return path
+
+    def fetch(self, key: str, ext: str, dest: str) -> bool:
+        """Place a cached result at dest; False on a miss"""
+        path = self.lookup(key, ext)
+        if not path:
+            return False
+        link_or_copy(path, dest)
+        return True
+
+    def store(self, key: str, ext: str, output_path: str) -> None:
+        path = self._path(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        try:
+            link_or_copy(output_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"[ResultCache] ✖ Could not cache {output_path}: {e}")
+            return
+        with self._lock:
+            if self._index is None:
+                self._load_index()
+            self._touch(path, size)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until the cache fits; called under _lock"""
+        while self._total > self.max_bytes and self._index:
+            path, size = self._index.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[ResultCache] ✖ Could not evict {path}: {e}")
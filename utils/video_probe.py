@@ -0,0 +1,98 @@
+import math
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable
+import cv2
+from utils.json_store import load_json, save_json
+
+def probe_video(video_path: str) -> dict:
+    """Read fps, frame count and resolution from the container (top-level so it pickles)"""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Failed to open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    return {
+        "fps": fps,
+        "frames": frames,
+        "width": width,
+        "height": height,
+        "duration": frames / fps if fps else 0.0
+    }
+
+def _file_stamp(path: str) -> dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+class VideoProbeIndex:
+    """
+    On-disk index of probe_video results keyed by path, size and mtime.
+    A file is only opened again when it changes, so repeated runs over the
+    same source folder skip probing entirely.
+    """
+    def __init__(self, index_path: str = None, max_workers: int = None):
+        self.index_path = index_path
+        self.max_workers = max_workers
+        self._entries = load_json(index_path, {}, "Probe")
+        self._lock = threading.Lock()
+
+    def _lookup(self, path: str, stamp: dict):
+        entry = self._entries.get(os.path.abspath(path))
+        if entry and entry["size"] == stamp["size"] and entry["mtime_ns"] == stamp["mtime_ns"]:
+            return entry
+        return None
+
+    def _store(self, path: str, stamp: dict, info: dict) -> dict:
+        entry = {**stamp, **info}
+        self._entries[os.path.abspath(path)] = entry
+        return entry
+
+    def save(self) -> None:
+        with self._lock:
+            snapshot = dict(self._entries)
+        save_json(self.index_path, snapshot)
+
+    def get(self, video_path: str) -> dict:
+        stamp = _file_stamp(video_path)
+        with self._lock:
+            entry = self._lookup(video_path, stamp)
+        if entry:
+            return entry
+
+        info = probe_video(video_path)
+        with self._lock:
+            entry = self._store(video_path, stamp, info)
+        self.save()
+        return entry
+
+    def ensure(self, video_paths: Iterable[str]) -> None:
+        """Probe every unknown or changed video in parallel worker processes"""
+        missing = []
+        for path in dict.fromkeys(video_paths):
+            stamp = _file_stamp(path)
+            with self._lock:
+                if not self._lookup(path, stamp):
+                    missing.append((path, stamp))
+        if not missing:
+            return
+
+        print(f"[Probe] Probing {len(missing)} video(s)...")
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [(path, stamp, executor.submit(probe_video, path)) for path, stamp in missing]
+            for path, stamp, future in futures:
+                try:
+                    info = future.result()
+                except Exception as e:
+                    print(f"[Probe] ✖ {path}: {e}")
+                    continue
+                with self._lock:
+                    self._store(path, stamp, info)
+        self.save()
+
+    def frame_count_at(self, video_path: str, fps: float = 16) -> int:
+        entry = self.get(video_path)
+        return math.ceil(entry["frames"] * fps / entry["fps"])
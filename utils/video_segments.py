@@ -0,0 +1,229 @@
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Callable, Iterable, List, Tuple
+import cv2
+from models.config_model import Workflow
+from utils.job_journal import DONE, make_job_id
+
+def plan_segments(total_frames: int, segment_frames: int, overlap: int, start: int = 0) -> List[Tuple[int, int]]:
+    """(skip_first_frames, frame_load_cap) for overlapping segments covering total_frames after start"""
+    available = total_frames - start
+    if available <= segment_frames:
+        return [(start, max(0, available))]
+    step = max(1, segment_frames - overlap)
+    segments = []
+    offset = 0
+    while True:
+        length = min(segment_frames, available - offset)
+        segments.append((start + offset, length))
+        if offset + length >= available:
+            return segments
+        offset += step
+
+def stitch_segments(segment_paths: List[str], overlap_frames: int, output_path: str) -> str:
+    """
+    Concatenate rendered segments, crossfading linearly over the overlap_frames
+    output frames neighbours share. Only the overlap window is held in memory.
+    Audio is not carried over.
+    """
+    tmp_path = f"{os.path.splitext(output_path)[0]}.{threading.get_ident()}.tmp.mp4"
+    writer = None
+    held = deque()  # tail of the previous segment, written once blended with the next
+
+    try:
+        for index, path in enumerate(segment_paths):
+            cap = cv2.VideoCapture(path)
+            if not cap.isOpened():
+                raise RuntimeError(f"Failed to open segment: {path}")
+            overlap = max(0, overlap_frames)
+
+            if writer is None:
+                fps = cap.get(cv2.CAP_PROP_FPS) or 16
+                width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+                height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+                writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+
+            blend = list(held)
+            held.clear()
+            i = 0
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                if i < len(blend):
+                    alpha = (i + 1) / (len(blend) + 1)
+                    frame = cv2.addWeighted(blend[i], 1 - alpha, frame, alpha, 0)
+                i += 1
+
+                last = index == len(segment_paths) - 1
+                if last or overlap == 0:
+                    writer.write(frame)
+                    continue
+                held.append(frame)
+                if len(held) > overlap:
+                    writer.write(held.popleft())
+            cap.release()
+
+            # A segment shorter than the overlap leaves unblended frames behind
+            for frame in blend[i:]:
+                writer.write(frame)
+
+        for frame in held:
+            writer.write(frame)
+    finally:
+        if writer is not None:
+            writer.release()
+
+    os.replace(tmp_path, output_path)
+    return output_path
+
+def output_overlap(segment_path: str, loaded_frames: int, overlap: int) -> int:
+    """
+    Output frames covering overlap loader frames. A segment's frame rate is
+    whatever its combine node writes, not the loader's, so this goes by the
+    ratio of frames rendered to frames loaded instead.
+    """
+    cap = cv2.VideoCapture(segment_path)
+    try:
+        rendered = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else 0
+    finally:
+        cap.release()
+    if rendered <= 0 or loaded_frames <= 0:
+        return overlap
+    return round(overlap * rendered / loaded_frames)
+
+def render_affinity(job: dict) -> Tuple:
+    """(video, person) cache key for run_jobs; segments of one video load different frames"""
+    video = f"{job['video']}@{job['segment'][0]}" if "segment" in job else job["video"]
+    return video, job["person"]
+
+class SegmentAssembler:
+    """
+    Splits V2V jobs on long source videos into overlapping segment jobs and
+    stitches their outputs back together once every segment has rendered.
+
+    expand() turns one job into segment jobs (or passes it through when the
+    video fits in one segment); on_done/on_error are handed to run_jobs in
+    place of the generator's own callbacks, which only ever see whole videos.
+    """
+    def __init__(
+        self,
+        pool,
+        workflow: Workflow,
+        output_subfolder: Callable[[dict], str],
+        on_done: Callable[[dict, str], None],
+        on_error: Callable[[dict, Exception], None]
+    ):
+        self.pool = pool
+        self.workflow = workflow
+        self.output_subfolder = output_subfolder
+        self.on_done = on_done
+        self.on_error = on_error
+        self._parents = {}
+        self._lock = threading.Lock()
+
+    def _loader(self) -> Tuple[dict, float]:
+        """Inputs of the template's video loader node and its forced frame rate (0 = native)"""
+        template = self.pool.template_cache.get(self.workflow.workflow_file)
+        inputs = template[str(self.workflow.inputs["video"])]["inputs"]
+        return inputs, float(inputs.get("force_rate") or 0)
+
+    def segments_for(self, video_path: str) -> List[Tuple[int, int]]:
+        inputs, force_rate = self._loader()
+        probe = self.pool.video_probe.get(video_path)
+        if force_rate:
+            total = self.pool.video_probe.frame_count_at(video_path, fps=force_rate)
+        else:
+            total = probe["frames"]
+        return plan_segments(
+            total,
+            self.workflow.segment_frames,
+            self.workflow.segment_overlap,
+            start=int(inputs.get("skip_first_frames") or 0)
+        )
+
+    def _final_path(self, job: dict) -> str:
+        output_dir = os.path.join(self.pool.output_folder, self.output_subfolder(job))
+        os.makedirs(output_dir, exist_ok=True)
+        return os.path.join(output_dir, datetime.now().strftime("%Y%m%d_%H%M%S") + f"_{job['id'][:8]}.mp4")
+
+    def expand(self, jobs: Iterable[dict]):
+        for job in jobs:
+            if not self.workflow.segment_frames:
+                yield job
+                continue
+
+            journal = self.pool.journal
+            entry = journal.get(job["id"]) if journal else None
+            if entry and entry["status"] == DONE and entry["output_path"] and os.path.exists(entry["output_path"]):
+                print(f"[Segments] ↷ Already stitched: {entry['output_path']}")
+                self.on_done(job, entry["output_path"])
+                continue
+
+            segments = self.segments_for(job["video"])
+            if len(segments) <= 1:
+                yield job
+                continue
+
+            with self._lock:
+                self._parents[job["id"]] = {"job": job, "segments": segments, "outputs": [None] * len(segments),
+                                            "failed": False}
+            print(f"[Segments] {os.path.basename(job['video'])} → {len(segments)} segments")
+            for index, segment in enumerate(segments):
+                yield {
+                    **job,
+                    "id": make_job_id(job["id"], "segment", index),
+                    "parent": job["id"],
+                    "shard_key": job.get("shard_key") or job["id"],
+                    "segment": segment,
+                    "segment_index": index
+                }
+
+    def done(self, job: dict, output: str) -> None:
+        if "parent" not in job:
+            self.on_done(job, output)
+            return
+
+        with self._lock:
+            parent = self._parents.get(job["parent"])
+            if parent is None:
+                return
+            parent["outputs"][job["segment_index"]] = output
+            if parent["failed"] or any(o is None for o in parent["outputs"]):
+                return
+            del self._parents[job["parent"]]
+
+        parent_job = parent["job"]
+        try:
+            # The first segment is always a full one
+            overlap = output_overlap(parent["outputs"][0], parent["segments"][0][1], self.workflow.segment_overlap)
+            final = stitch_segments(parent["outputs"], overlap, self._final_path(parent_job))
+        except Exception as e:
+            self.on_error(parent_job, e)
+            return
+
+        if self.pool.journal:
+            self.pool.journal.mark_done(parent_job["id"], final)
+        for path in parent["outputs"]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        print(f"[Segments] ✔ Stitched {len(parent['outputs'])} segments → {final}")
+        self.on_done(parent_job, final)
+
+    def error(self, job: dict, error: Exception) -> None:
+        if "parent" not in job:
+            self.on_error(job, error)
+            return
+
+        with self._lock:
+            parent = self._parents.get(job["parent"])
+            if parent is None or parent["failed"]:
+                return
+            # Finished segments stay on disk and in the journal for a --resume
+            parent["failed"] = True
+            del self._parents[job["parent"]]
+        self.on_error(parent["job"], RuntimeError(f"Segment {job['segment_index']} failed: {error}"))
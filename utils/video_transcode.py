@@ -0,0 +1,148 @@
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, Iterable
+import cv2
+from utils.file_hash import FileHashCache
+
+def _fit(width: int, height: int, max_width: int, max_height: int):
+    """Largest even size within the box keeping the aspect ratio; never upscales"""
+    scale = min(1.0, max_width / width, max_height / height)
+    return max(2, int(width * scale) // 2 * 2), max(2, int(height * scale) // 2 * 2)
+
+def transcode_video(src: str, dest: str, fps: float, max_width: int, max_height: int) -> str:
+    """
+    Re-encode src to fps (0 keeps the source rate) within max_width x max_height
+    (top-level so it pickles). Uses ffmpeg when on PATH, which keeps the audio
+    track; otherwise OpenCV, which drops it.
+    """
+    tmp_path = f"{os.path.splitext(dest)[0]}.{os.getpid()}.tmp.mp4"
+    ffmpeg = shutil.which("ffmpeg")
+
+    if ffmpeg:
+        filters = []
+        if fps:
+            filters.append(f"fps={fps}")
+        filters.append(
+            f"scale='min(iw,{max_width})':'min(ih,{max_height})'"
+            ":force_original_aspect_ratio=decrease:force_divisible_by=2"
+        )
+        result = subprocess.run(
+            [
+                ffmpeg, "-y", "-v", "error", "-i", src, "-vf", ",".join(filters),
+                "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-movflags", "+faststart", tmp_path
+            ],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed on {src}: {result.stderr.strip()[-500:]}")
+    else:
+        cap = cv2.VideoCapture(src)
+        if not cap.isOpened():
+            raise RuntimeError(f"Failed to open video: {src}")
+        src_fps = cap.get(cv2.CAP_PROP_FPS) or fps or 16
+        out_fps = fps or src_fps
+        size = _fit(int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), max_width, max_height)
+        writer = cv2.VideoWriter(tmp_path, cv2.VideoWriter_fourcc(*"mp4v"), out_fps, size)
+
+        # Keep the source frame nearest to each output timestamp (what force_rate does)
+        index = 0
+        written = 0
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            while written * src_fps <= index * out_fps:
+                writer.write(cv2.resize(frame, size, interpolation=cv2.INTER_AREA) if frame.shape[1::-1] != size else frame)
+                written += 1
+            index += 1
+        cap.release()
+        writer.release()
+        if not written:
+            os.remove(tmp_path)
+            raise RuntimeError(f"No frames decoded from {src}")
+
+    os.replace(tmp_path, dest)
+    return dest
+
+class VideoTranscoder:
+    """
+    Local pre-processing of source videos to the rate and size a workflow
+    actually renders at, so servers decode small ready-made inputs instead of
+    full-rate phone video. Results are cached by content hash and settings;
+    start() queues every video on a process pool ahead of the render queue
+    and path_for() hands back the transcoded file (waiting only if needed).
+    """
+    def __init__(
+        self,
+        cache_folder: str,
+        hashes: FileHashCache,
+        fps: float,
+        max_width: int,
+        max_height: int,
+        max_workers: int = None
+    ):
+        self.folder = os.path.join(cache_folder, "transcoded")
+        self.hashes = hashes
+        self.fps = fps
+        self.max_width = max_width
+        self.max_height = max_height
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+
+        self._futures: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._processes = None
+        self._threads = None
+        self._warned = False
+
+    def _dest(self, digest: str) -> str:
+        fps = f"{self.fps:g}fps" if self.fps else "native"
+        return os.path.join(self.folder, digest[:2], f"{digest}_{fps}_{self.max_width}x{self.max_height}.mp4")
+
+    def _prepare(self, video_path: str) -> str:
+        dest = self._dest(self.hashes.hash(video_path))
+        if os.path.exists(dest):
+            return dest
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        try:
+            self._processes.submit(
+                transcode_video, video_path, dest, self.fps, self.max_width, self.max_height
+            ).result()
+        except Exception as e:
+            print(f"[Transcode] ✖ {os.path.basename(video_path)}: {e}; using the original")
+            return video_path
+        print(f"[Transcode] ✔ {os.path.basename(video_path)} → {os.path.basename(dest)}")
+        return dest
+
+    def start(self, video_paths: Iterable[str]) -> None:
+        if self._processes is None:
+            if not shutil.which("ffmpeg") and not self._warned:
+                print("[Transcode] ffmpeg not found; falling back to OpenCV (audio tracks are dropped)")
+                self._warned = True
+            self._processes = ProcessPoolExecutor(max_workers=self.max_workers)
+            # Hashing and cache checks happen in threads that each drive one worker process
+            self._threads = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="transcode")
+        with self._lock:
+            for path in video_paths:
+                if path not in self._futures:
+                    self._futures[path] = self._threads.submit(self._prepare, path)
+
+    def path_for(self, video_path: str) -> str:
+        with self._lock:
+            future = self._futures.get(video_path)
+        if future is None:
+            self.start([video_path])
+            with self._lock:
+                future = self._futures[video_path]
+        return future.result()
+
+    def close(self) -> None:
+        if self._threads:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+            self._threads = None
+        if self._processes:
+            self._processes.shutdown(wait=False, cancel_futures=True)
+            self._processes = None
@@ -0,0 +1,53 @@
+import json
+import os
+import threading
+
+class WorkflowView(dict):
+    """
+    Per-job view of a cached workflow template.
+    Starts as a shallow copy, so every node is shared with the template until
+    it is patched; node() copies just that node (and its inputs) on first write.
+    The template itself must never be mutated through a view.
+    """
+    def __init__(self, template: dict):
+        super().__init__(template)
+        self._copied = set()
+
+    def node(self, node_id) -> dict:
+        """Writable copy of a node"""
+        key = str(node_id)
+        if key not in self._copied:
+            original = self[key]
+            self[key] = {**original, "inputs": dict(original.get("inputs", {}))}
+            self._copied.add(key)
+        return self[key]
+
+    def set_input(self, node_id, name: str, value) -> None:
+        self.node(node_id)["inputs"][name] = value
+
+class WorkflowTemplateCache:
+    """Parsed workflow JSON keyed by path, re-read only when the file's mtime or size changes"""
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, workflow_path: str) -> dict:
+        """Shared parsed template; treat as read-only"""
+        st = os.stat(workflow_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        key = os.path.abspath(workflow_path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == stamp:
+                return entry[1]
+
+        with open(workflow_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        with self._lock:
+            self._entries[key] = (stamp, data)
+        return data
+
+    def view(self, workflow_path: str) -> WorkflowView:
+        return WorkflowView(self.get(workflow_path))